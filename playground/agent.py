@@ -1,83 +1,266 @@
 """
 Reinforcement learning agent implementation using PPO.
-Uses DistilBERT for text processing and a custom actor-critic architecture.
+Uses a frozen text encoder (DistilBERT by default, see encoders.py) and a
+custom actor-critic architecture.
 
 The implementation includes:
 - RolloutBuffer: Stores trajectories during agent rollouts
-- ActorCritic: Neural network with BERT text encoder and separate actor/critic heads
+- ActorCritic: Neural network with a text encoder and separate actor/critic heads
+- trainable_state_dict: The ActorCritic weights that change during training
 - ShrineAgent: Main PPO agent implementation
 
-The agent uses mixed precision training with automatic mixed precision (AMP)
-and gradient scaling for better performance on GPUs.
+Device, autocast precision and gradient scaling come from an ExecutionPolicy
+(see execution.py): float16 AMP with a gradient scaler on CUDA by default,
+and float32 or bfloat16 on CPU.
 
 Key features:
-- DistilBERT for text encoding (frozen parameters)
+- Pluggable frozen text encoder: DistilBERT, hashed n-grams or TF-IDF
 - PPO with clipped objective and GAE-Lambda advantage estimation
-- Combined text and game state features
-- Automatic action masking for invalid choices
+- Combined text and game state features (items and story attributes)
+- Action masking for invalid choices in logit space
+- Batched action selection for vectorized environments (act_batch)
+- LRU cache of text embeddings, so BERT only runs on texts it has not seen
+- Optional precomputed embedding store; BERT is then only loaded on a miss
 """
 
 import gc
+from collections import OrderedDict
 import torch
 import numpy as np
 import torch.nn as nn
 import torch.optim as optim
-from transformers import DistilBertTokenizer, DistilBertModel
 from torch.distributions import Categorical
+from cache import LRUCache
+from encoders import BertEncoder, make_encoder
+from execution import ExecutionPolicy
+from interning import StringInterner, string_id
 
 
 class RolloutBuffer:
-    """Stores trajectories collected during agent rollouts."""
-
-    def __init__(self):
-        self.states = []
-        self.actions = []
-        self.rewards = []
-        self.next_states = []
-        self.dones = []
-        self.log_probs = []
-        self.values = []
+    """Stores trajectories collected during agent rollouts.
+
+    Transitions live in preallocated NumPy arrays (text as interned IDs),
+    so adding one is a handful of array writes and reading them back is a
+    zero-copy slice. The arrays double in size if the capacity is exceeded.
+    """
+
+    ARRAYS = (
+        "text_ids",
+        "state_features",
+        "actions",
+        "num_choices",
+        "rewards",
+        "dones",
+        "log_probs",
+        "values",
+    )
+
+    def __init__(self, capacity=256, num_state_features=11):
+        self.capacity = capacity
+        self.size = 0
+        self.interner = StringInterner()
+        self.text_ids = np.empty(capacity, dtype=np.int64)
+        self.state_features = np.empty((capacity, num_state_features), np.float32)
+        self.actions = np.empty(capacity, dtype=np.int64)
+        self.num_choices = np.empty(capacity, dtype=np.int64)
+        self.rewards = np.empty(capacity, dtype=np.float32)
+        self.dones = np.empty(capacity, dtype=np.bool_)
+        self.log_probs = np.empty(capacity, dtype=np.float32)
+        self.values = np.empty(capacity, dtype=np.float32)
 
     def clear(self):
-        """Clears all stored trajectories."""
-        self.states.clear()
-        self.actions.clear()
-        self.rewards.clear()
-        self.next_states.clear()
-        self.dones.clear()
-        self.log_probs.clear()
-        self.values.clear()
-
-    def add(self, state, action, reward, next_state, done, log_prob, value):
+        """Clears all stored trajectories (the arrays are kept for reuse)."""
+        self.size = 0
+
+    def _reserve(self, count):
+        """Make room for count more transitions."""
+        if self.size + count <= self.capacity:
+            return
+        while self.capacity < self.size + count:
+            self.capacity *= 2
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            new = np.empty((self.capacity, *old.shape[1:]), dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, name, new)
+
+    def add(self, state, action, reward, done, log_prob, value):
         """Adds a single transition."""
-        self.states.append(state)
-        self.actions.append(action)
-        self.rewards.append(reward)
-        self.next_states.append(next_state)
-        self.dones.append(done)
-        self.log_probs.append(log_prob)
-        self.values.append(value)
+        self._reserve(1)
+        i = self.size
+        n_items = len(state["items"])
+        self.text_ids[i] = self.interner.intern(state["text"])
+        self.state_features[i, :n_items] = state["items"]
+        self.state_features[i, n_items:] = state["attributes"]
+        self.actions[i] = action
+        self.num_choices[i] = len(state["choices"])
+        self.rewards[i] = reward
+        self.dones[i] = done
+        self.log_probs[i] = float(log_prob)
+        self.values[i] = float(value)
+        self.size += 1
+
+    def extend(
+        self,
+        texts,
+        state_features,
+        actions,
+        num_choices,
+        rewards,
+        dones,
+        log_probs,
+        values,
+    ):
+        """Adds a whole trajectory of transitions given as arrays."""
+        count = len(texts)
+        self._reserve(count)
+        end = self.size + count
+        self.text_ids[self.size : end] = [self.interner.intern(text) for text in texts]
+        self.state_features[self.size : end] = state_features
+        self.actions[self.size : end] = actions
+        self.num_choices[self.size : end] = num_choices
+        self.rewards[self.size : end] = rewards
+        self.dones[self.size : end] = dones
+        self.log_probs[self.size : end] = log_probs
+        self.values[self.size : end] = values
+        self.size = end
+
+    def view(self, start=0, stop=None):
+        """Return the transitions in [start, stop) as zero-copy array slices."""
+        stop = self.size if stop is None else min(stop, self.size)
+        return {name: getattr(self, name)[start:stop] for name in self.ARRAYS}
+
+    def texts(self, start=0, stop=None):
+        """Return the observation texts of the transitions in [start, stop)."""
+        return [
+            self.interner.lookup(int(i)) for i in self.view(start, stop)["text_ids"]
+        ]
+
+    def __len__(self):
+        return self.size
+
+
+def masked_logits(logits, num_choices):
+    """Rule out actions beyond each row's number of choices.
+
+    Args:
+        logits: Action logits, shape (N, action_size)
+        num_choices: Valid choices per row, shape (N,)
+
+    Returns:
+        Logits with the invalid actions set to the lowest finite value
+    """
+    actions = torch.arange(logits.shape[-1], device=logits.device)
+    valid = actions < num_choices.to(logits.device).unsqueeze(-1)
+    return logits.masked_fill(~valid, torch.finfo(logits.dtype).min)
+
+
+def compute_gae(rewards, values, dones, gamma, gae_lambda, last_values=0.0):
+    """Compute GAE-Lambda advantages and returns.
+
+    Accepts a single trajectory laid out as (T,) or parallel environments
+    laid out as (T, N). The TD errors are computed for every step at once;
+    the remaining backward recursion is one vector operation per time step.
+    A done step neither bootstraps from nor propagates advantage to the
+    step after it.
+
+    Args:
+        rewards: Rewards, shape (T,) or (T, N)
+        values: Critic value estimates, same shape
+        dones: Episode-end flags, same shape
+        gamma: Discount factor
+        gae_lambda: GAE smoothing factor
+        last_values: Value estimates after the final step (0 treats the
+            buffer end as an episode end)
+
+    Returns:
+        Tuple of (advantages, returns) as float32 arrays of the input shape
+    """
+    rewards = np.asarray(rewards, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    not_done = 1.0 - np.asarray(dones, dtype=np.float64)
+
+    next_values = np.empty_like(values)
+    next_values[:-1] = values[1:]
+    next_values[-1:] = last_values
+    deltas = rewards + gamma * next_values * not_done - values
+    decay = gamma * gae_lambda * not_done
+
+    advantages = np.empty_like(deltas)
+    advantage = np.zeros(deltas.shape[1:])
+    for t in range(len(deltas) - 1, -1, -1):
+        advantage = deltas[t] + decay[t] * advantage
+        advantages[t] = advantage
+
+    returns = advantages + values
+    return advantages.astype(np.float32), returns.astype(np.float32)
+
+
+# State dict prefix of the frozen BERT weights older policies held
+FROZEN_PREFIX = "bert."
+
+
+def trainable_state_dict(policy):
+    """Return the policy weights that change during training.
+
+    Args:
+        policy: ActorCritic network
+
+    Returns:
+        State dict without the frozen BERT encoder weights
+    """
+    return {
+        key: value
+        for key, value in policy.state_dict().items()
+        if not key.startswith(FROZEN_PREFIX)
+    }
 
 
 class ActorCritic(nn.Module):
     """Neural network implementing both actor and critic networks.
-    Uses DistilBERT for text processing."""
-
-    def __init__(self, model_name="distilbert-base-uncased", hidden_size=128):
+    Uses a frozen text encoder (DistilBERT unless another is given)."""
+
+    def __init__(
+        self,
+        model_name="distilbert-base-uncased",
+        hidden_size=128,
+        num_state_features=11,
+        embedding_cache_size=4096,
+        embedding_store=None,
+        execution=None,
+        encoder=None,
+        encoder_layers=None,
+    ):
         super(ActorCritic, self).__init__()
-        self.bert = DistilBertModel.from_pretrained(
-            model_name, torch_dtype=torch.float16
+        self.execution = execution or ExecutionPolicy()
+
+        # The encoder is frozen and kept out of the state dict; with a
+        # precomputed store, BERT is only loaded if a text is missing from it.
+        # encoder_layers keeps only that many of BERT's transformer layers.
+        self.encoder = encoder or BertEncoder(
+            model_name,
+            self.execution,
+            lazy=embedding_store is not None,
+            num_layers=encoder_layers,
         )
-        self.tokenizer = DistilBertTokenizer.from_pretrained(model_name)
+        self.embedding_store = embedding_store
+        if (
+            embedding_store is not None
+            and embedding_store.model_name != self.encoder.name
+        ):
+            raise ValueError(
+                f"Embedding store was built with '{embedding_store.model_name}', "
+                f"not '{self.encoder.name}'."
+            )
 
-        # Freeze BERT parameters
-        self.bert.eval()
-        for param in self.bert.parameters():
-            param.requires_grad = False
+        # Frozen encoder: a text's embedding never changes, so it is computed once
+        self.embedding_cache = (
+            LRUCache(embedding_cache_size) if embedding_cache_size > 0 else None
+        )
 
-        # Combines BERT output with game state features
+        # Combines text features with game state features
         self.feature_combiner = nn.Sequential(
-            nn.Linear(768 + 5, hidden_size),  # Updated for 5 item features
+            nn.Linear(self.encoder.output_dim + num_state_features, hidden_size),
             nn.ReLU(),
             nn.LayerNorm(hidden_size),
             nn.Dropout(0.2),
@@ -90,7 +273,6 @@ class ActorCritic(nn.Module):
             nn.LayerNorm(64),
             nn.Dropout(0.1),
             nn.Linear(64, 4),
-            nn.Softmax(dim=-1),
         )
 
         # Critic network
@@ -102,53 +284,130 @@ class ActorCritic(nn.Module):
             nn.Linear(64, 1),
         )
 
-    @torch.autocast(device_type="cuda")
+    def load_state_dict(self, state_dict, strict=True, assign=False):
+        """Load weights, skipping the frozen BERT ones older checkpoints include."""
+        filtered = OrderedDict(
+            (key, value)
+            for key, value in state_dict.items()
+            if not key.startswith(FROZEN_PREFIX)
+        )
+        # Module versions, which e.g. quantized layers need to read their keys
+        filtered._metadata = getattr(state_dict, "_metadata", None)  # type: ignore
+        return super().load_state_dict(filtered, strict=strict, assign=assign)
+
+    def encode_text(self, text_batch):
+        """Return text features for a batch, running the encoder on cache misses only."""
+        device = self.execution.device
+        if self.embedding_cache is None and self.embedding_store is None:
+            return self.encoder.encode(text_batch).to(device)
+
+        # Float32, which is what the heads consume (see heads())
+        keys = [string_id(text) for text in text_batch]
+        embeddings = torch.empty(len(keys), self.encoder.output_dim, device=device)
+        found = [False] * len(keys)
+
+        if self.embedding_store is not None:
+            positions, stored = self.embedding_store.lookup(keys)
+            embeddings[positions] = torch.from_numpy(stored).to(device).float()
+            for i in positions:
+                found[i] = True
+
+        if self.embedding_cache is not None:
+            for i, key in enumerate(keys):
+                if not found[i]:
+                    cached = self.embedding_cache.get(key)
+                    if cached is not None:
+                        embeddings[i] = cached
+                        found[i] = True
+
+        # Encode each distinct missing text once
+        misses = {}
+        for key, text, hit in zip(keys, text_batch, found):
+            if not hit:
+                misses.setdefault(key, text)
+        if misses:
+            encoded = self.encoder.encode(list(misses.values())).to(device).clone()
+            encoded = dict(zip(misses, encoded))
+            if self.embedding_cache is not None:
+                for key, embedding in encoded.items():
+                    self.embedding_cache.put(key, embedding)
+            for i, key in enumerate(keys):
+                if not found[i]:
+                    embeddings[i] = encoded[key]
+
+        return embeddings
+
+    def embedding_cache_stats(self):
+        """Return the embedding cache counters (None when caching is disabled)."""
+        return self.embedding_cache.stats() if self.embedding_cache else None
+
     def forward(self, text_batch, stats, items):
         """Process text and game state features."""
         if isinstance(text_batch, str):
             text_batch = [text_batch]
 
-        # Tokenize text
-        tokens = self.tokenizer(
-            text_batch,
-            return_tensors="pt",
-            max_length=256,
-            truncation=True,
-            padding=True,
-        )
+        # Get text features (served from the cache where possible)
+        return self.heads(self.encode_text(text_batch), items)
 
-        # Move to device
-        device = next(self.bert.parameters()).device
-        tokens = {k: v.to(device, non_blocking=True) for k, v in tokens.items()}
-        items = items.to(device, non_blocking=True)
+    def heads(self, bert_output, items):
+        """Run the trainable actor and critic on precomputed text features."""
+        with self.execution.autocast():
+            items = items.to(bert_output.device, non_blocking=True)
 
-        # Get BERT embeddings
-        with torch.no_grad(), torch.autocast(device_type="cuda"):
-            bert_output = self.bert(**tokens)[0][:, 0, :]
+            # Combine features (outside autocast the float32 heads need float32)
+            combined_input = torch.cat([bert_output, items], dim=1).float()
+            features = self.feature_combiner(combined_input)
 
-        # Combine features
-        combined_input = torch.cat([bert_output, items], dim=1)
-        features = self.feature_combiner(combined_input)
+            # Get outputs (unnormalized action logits, see masked_logits)
+            logits = self.actor(features)
+            value = self.critic(features)
 
-        # Get outputs
-        action_probs = self.actor(features)
-        value = self.critic(features)
-
-        return action_probs, value
+        # Distributions and losses are computed in full precision
+        return logits.float(), value.float()
 
 
 class ShrineAgent:
     """PPO agent for text adventure game."""
 
-    def __init__(self, state_size, action_size, batch_size=256):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        torch.backends.cudnn.benchmark = True
+    def __init__(
+        self,
+        state_size,
+        action_size,
+        batch_size=256,
+        device=None,
+        embedding_cache_size=4096,
+        embedding_store=None,
+        precision="auto",
+        minibatch_size=64,
+        encoder=None,
+        encoder_layers=None,
+    ):
+        self.execution = ExecutionPolicy(device, precision)
+        self.device = self.execution.device
+        if self.device.type == "cuda":
+            torch.backends.cudnn.benchmark = True
+
+        # An encoder kind ("bert", "hashing", "tfidf") or a TextEncoder
+        if isinstance(encoder, str):
+            encoder = make_encoder(
+                encoder,
+                self.execution,
+                lazy=embedding_store is not None,
+                num_layers=encoder_layers,
+            )
 
-        self.policy = ActorCritic().to(self.device)
+        self.policy = ActorCritic(
+            num_state_features=state_size - 768,
+            embedding_cache_size=embedding_cache_size,
+            embedding_store=embedding_store,
+            execution=self.execution,
+            encoder=encoder,
+            encoder_layers=encoder_layers,
+        ).to(self.device)
         self.optimizer = optim.AdamW(self.policy.parameters(), lr=0.0003)
-        self.scaler = torch.amp.GradScaler()  # type: ignore
+        self.scaler = self.execution.make_scaler()
 
-        self.memory = RolloutBuffer()
+        self.memory = RolloutBuffer(batch_size, num_state_features=state_size - 768)
 
         # PPO hyperparameters
         self.gamma = 0.98
@@ -159,117 +418,132 @@ class ShrineAgent:
         self.max_grad_norm = 0.5
         self.ppo_epochs = 12
         self.batch_size = batch_size
-
-    @torch.no_grad()
-    def get_state_representation(self, observation):
-        """Convert observation to tensors."""
-        text = observation["text"]
-        items_array = np.array([observation["items"]])
-        items = torch.tensor(items_array, dtype=torch.float16, device=self.device)
-        return text, items
+        self.minibatch_size = minibatch_size
 
     @torch.no_grad()
     def act(self, observation):
         """Select an action using the policy."""
-        text, items = self.get_state_representation(observation)
-        action_probs, value = self.policy(text, items, items)
+        batch = {
+            "text": [observation["text"]],
+            "choices": [observation["choices"]],
+            "items": np.asarray(observation["items"])[None],
+            "attributes": np.asarray(observation["attributes"])[None],
+        }
+        actions, log_probs, values = self.act_batch(batch)
+        return actions[0].item(), log_probs[0], values[:1].unsqueeze(-1)
 
-        # Improve action masking
-        num_choices = len(observation["choices"])
-        mask = torch.zeros_like(action_probs)
-        mask[0, :num_choices] = 1
+    @torch.no_grad()
+    def action_distribution(self, observations):
+        """Return the masked action distribution for a batch of observations.
+
+        Args:
+            observations: Batched observation (see vec_env.batch_observations)
+                with "text", "choices", "items" and "attributes" fields
+
+        Returns:
+            Tuple of (Categorical over actions, values of shape (N,))
+        """
+        state_features = np.concatenate(
+            [observations["items"], observations["attributes"]], axis=1
+        )
+        items = torch.tensor(state_features, dtype=torch.float32, device=self.device)
+        num_choices = torch.tensor(
+            [len(choices) for choices in observations["choices"]], device=self.device
+        )
 
-        # Add small epsilon to prevent zero probabilities
-        masked_probs = action_probs * mask + 1e-8
-        masked_probs = masked_probs / masked_probs.sum()
+        logits, values = self.policy(observations["text"], items, items)
+        return Categorical(logits=masked_logits(logits, num_choices)), values.squeeze(
+            -1
+        )
 
-        # Add temperature scaling for exploration
-        temperature = 1.0
-        masked_probs = masked_probs.pow(1 / temperature)
-        masked_probs = masked_probs / masked_probs.sum()
+    @torch.no_grad()
+    def act_batch(self, observations):
+        """Select actions for a batch of observations in one forward pass.
 
-        dist = Categorical(masked_probs[0])
-        action = dist.sample()
+        Args:
+            observations: Batched observation (see vec_env.batch_observations)
+                with "text", "choices", "items" and "attributes" fields
 
-        return action.item(), dist.log_prob(action), value
+        Returns:
+            Tuple of (actions, log_probs, values) tensors of shape (N,)
+        """
+        dist, values = self.action_distribution(observations)
+        actions = dist.sample()
+        return actions, dist.log_prob(actions), values
 
     def update(self, entropy_coef=0.01):
         """Update policy using PPO."""
-        returns = []
-        advantages = []
+        batch = self.memory.view()
 
         # Calculate returns and advantages
-        next_value = 0
-        advantage = 0
-        for reward, value, done in zip(
-            reversed(self.memory.rewards),
-            reversed(self.memory.values),
-            reversed(self.memory.dones),
-        ):
-            if done:
-                next_value = 0
-                advantage = 0
-
-            td_error = reward + self.gamma * next_value * (1 - done) - value
-            advantage = td_error + self.gamma * self.gae_lambda * advantage * (1 - done)
-
-            returns.insert(0, advantage + value)
-            advantages.insert(0, advantage)
-
-            next_value = value
+        advantages, returns = compute_gae(
+            batch["rewards"],
+            batch["values"],
+            batch["dones"],
+            self.gamma,
+            self.gae_lambda,
+        )
 
         # Convert to tensors
-        returns = torch.tensor(returns, dtype=torch.float16, device=self.device)
-        advantages = torch.tensor(advantages, dtype=torch.float16, device=self.device)
-        old_log_probs = torch.stack(self.memory.log_probs)
+        returns = torch.from_numpy(returns).to(self.device)
+        advantages = torch.from_numpy(advantages).to(self.device)
+        old_log_probs = torch.from_numpy(batch["log_probs"]).to(self.device)
 
         # Normalize advantages
         advantages = (advantages - advantages.mean()) / (advantages.std() + 1e-8)
 
-        # PPO update loop
-        for _ in range(self.ppo_epochs):
-            # Prepare batch
-            text_batch = [s["text"] for s in self.memory.states]
-            items_array = np.array([s["items"] for s in self.memory.states])
-            items_batch = torch.tensor(
-                items_array, dtype=torch.float16, device=self.device
-            )
-            actions_batch = torch.tensor(self.memory.actions, device=self.device)
-
-            # Get new probabilities and values
-            action_probs, values = self.policy(text_batch, items_batch, items_batch)
-            dist = Categorical(action_probs)
-            new_log_probs = dist.log_prob(actions_batch)
-            entropy = dist.entropy().mean()
-
-            # Compute PPO objective
-            ratio = (new_log_probs - old_log_probs).exp()
-            surr1 = ratio * advantages
-            surr2 = (
-                torch.clamp(ratio, 1.0 - self.clip_epsilon, 1.0 + self.clip_epsilon)
-                * advantages
-            )
-
-            # Compute losses with adjustable entropy coefficient
-            actor_loss = -torch.min(surr1, surr2).mean()
-            values_clipped = values.squeeze()
-            values_clipped = torch.clamp(
-                values_clipped,
-                min=-100.0,  # Prevent extreme negative values
-                max=100.0,  # Prevent extreme positive values
-            )
-            critic_loss = 0.5 * (returns - values_clipped).pow(2).mean()
-            loss = actor_loss + self.c1 * critic_loss - entropy_coef * entropy
+        # The encoder is frozen, so the rollout is encoded once for every epoch.
+        # It is passed whole so the encoder can bucket all of it by length
+        # (its token budget per sub-batch bounds peak memory).
+        text_batch = self.memory.texts()
+        text_features = self.policy.encode_text(text_batch)
+        items_batch = torch.from_numpy(batch["state_features"]).to(self.device)
+        actions_batch = torch.from_numpy(batch["actions"]).to(self.device)
+        num_choices = torch.from_numpy(batch["num_choices"]).to(self.device)
 
-            # Optimize
-            self.optimizer.zero_grad(set_to_none=True)
-            self.scaler.scale(loss).backward()
-
-            self.scaler.unscale_(self.optimizer)
-            torch.nn.utils.clip_grad_norm_(self.policy.parameters(), self.max_grad_norm)
-
-            self.scaler.step(self.optimizer)
-            self.scaler.update()
+        # PPO update loop over shuffled minibatches
+        for _ in range(self.ppo_epochs):
+            permutation = torch.randperm(len(text_batch), device=self.device)
+            for indices in permutation.split(self.minibatch_size):
+                # Get new probabilities and values
+                logits, values = self.policy.heads(
+                    text_features[indices], items_batch[indices]
+                )
+                # Same masking as at collection time, so the log-probs agree
+                dist = Categorical(logits=masked_logits(logits, num_choices[indices]))
+                new_log_probs = dist.log_prob(actions_batch[indices])
+                entropy = dist.entropy().mean()
+
+                # Compute PPO objective
+                ratio = (new_log_probs - old_log_probs[indices]).exp()
+                surr1 = ratio * advantages[indices]
+                surr2 = (
+                    torch.clamp(ratio, 1.0 - self.clip_epsilon, 1.0 + self.clip_epsilon)
+                    * advantages[indices]
+                )
+
+                # Compute losses with adjustable entropy coefficient
+                actor_loss = -torch.min(surr1, surr2).mean()
+                values_clipped = values.squeeze(-1)
+                values_clipped = torch.clamp(
+                    values_clipped,
+                    min=-100.0,  # Prevent extreme negative values
+                    max=100.0,  # Prevent extreme positive values
+                )
+                critic_loss = 0.5 * (returns[indices] - values_clipped).pow(2).mean()
+                loss = actor_loss + self.c1 * critic_loss - entropy_coef * entropy
+
+                # Optimize
+                self.optimizer.zero_grad(set_to_none=True)
+                self.scaler.scale(loss).backward()
+
+                self.scaler.unscale_(self.optimizer)
+                torch.nn.utils.clip_grad_norm_(
+                    self.policy.parameters(), self.max_grad_norm
+                )
+
+                self.scaler.step(self.optimizer)
+                self.scaler.update()
 
         # Clean up
         self.memory.clear()
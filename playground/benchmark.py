@@ -0,0 +1,356 @@
+"""
+Benchmarks for the reinforcement learning environment.
+
+Measures:
+- Episode reset latency using the story snapshot (including the deferred load)
+- Episode reset latency when re-parsing the story JSON (the old behaviour)
+- Step latency, with and without the transition cache
+- Steps per second under random and fixed policies
+- Where step time goes: story interpreter, state capture, reward, observation
+
+Key features:
+- Warmup iterations before timing
+- Median, mean and p95 latency reporting
+- Speedup of snapshot resets over re-parsing
+- Results saved as JSON (with the git commit) for comparing commits
+
+Usage:
+    python playground/benchmark.py --output results/benchmark.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+import numpy as np
+from bink.story import story_from_file
+from env import ReinforcedShrineAdventureEnv, STORY_PATH
+
+# Env methods timed by the step breakdown, by the category they are reported under
+BREAKDOWN_METHODS = {
+    "sync_story": "interpreter",
+    "_run_story": "interpreter",
+    "_transition": "transition",
+    "calculate_reward": "reward",
+    "_get_observation": "observation",
+}
+
+
+def time_calls(fn, repeats=1000, warmup=50):
+    """Time repeated calls of a function.
+
+    Args:
+        fn: Zero-argument callable to time
+        repeats: Number of timed calls
+        warmup: Number of untimed calls made first
+
+    Returns:
+        Array of per-call latencies in seconds
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = np.empty(repeats, dtype=np.float64)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+
+    return timings
+
+
+def reparse_reset():
+    """Reset the way the environment used to: parse the story and run the intro."""
+    story = story_from_file(STORY_PATH)
+    text = ""
+    while story.can_continue():
+        text += story.cont() + "\n"
+    return text, [choice for choice in story.get_current_choices()]
+
+
+def snapshot_reset(env):
+    """Reset from the snapshot and load it into the interpreter.
+
+    reset() only marks the story stale and the ink state is loaded on the
+    next step, so the load is included to compare like with like.
+    """
+    result = env.reset()
+    env.sync_story()
+    return result
+
+
+def benchmark_reset(repeats=1000, warmup=50):
+    """Compare snapshot resets (including the deferred load) against re-parsing.
+
+    Args:
+        repeats: Number of timed resets per method
+        warmup: Number of untimed resets per method
+
+    Returns:
+        Dictionary of latency statistics in microseconds
+    """
+    env = ReinforcedShrineAdventureEnv()
+    snapshot = time_calls(lambda: snapshot_reset(env), repeats, warmup)
+    reparse = time_calls(reparse_reset, repeats, warmup)
+
+    return {
+        "snapshot_median_us": float(np.median(snapshot) * 1e6),
+        "snapshot_mean_us": float(np.mean(snapshot) * 1e6),
+        "reparse_median_us": float(np.median(reparse) * 1e6),
+        "reparse_mean_us": float(np.mean(reparse) * 1e6),
+        "speedup": float(np.median(reparse) / np.median(snapshot)),
+    }
+
+
+def summarize(timings):
+    """Reduce per-call latencies (seconds) to statistics in microseconds."""
+    return {
+        "median_us": float(np.median(timings) * 1e6),
+        "mean_us": float(np.mean(timings) * 1e6),
+        "p95_us": float(np.percentile(timings, 95) * 1e6),
+    }
+
+
+def random_policy(seed=0):
+    """Return a policy picking uniformly among the current choices."""
+    rng = np.random.default_rng(seed)
+    return lambda observation: int(rng.integers(len(observation["choices"])))
+
+
+def fixed_policy(action=0):
+    """Return a policy that always picks the same choice."""
+    return lambda observation: action
+
+
+def time_steps(env, policy, repeats=1000, warmup=50):
+    """Time individual env.step() calls, resetting (untimed) between episodes.
+
+    Args:
+        env: Environment to step
+        policy: Callable mapping an observation to an action
+        repeats: Number of timed steps
+        warmup: Number of untimed steps taken first
+
+    Returns:
+        Array of per-step latencies in seconds
+    """
+    observation, _ = env.reset()
+    timings = np.empty(repeats, dtype=np.float64)
+    for i in range(-warmup, repeats):
+        action = policy(observation)
+        start = time.perf_counter()
+        observation, _, done, truncated, _ = env.step(action)
+        elapsed = time.perf_counter() - start
+        if i >= 0:
+            timings[i] = elapsed
+        if done or truncated:
+            observation, _ = env.reset()
+
+    return timings
+
+
+def benchmark_step(repeats=1000, warmup=50):
+    """Measure step latency under a random policy, with and without the cache.
+
+    Args:
+        repeats: Number of timed steps per configuration
+        warmup: Number of untimed steps per configuration
+
+    Returns:
+        Dictionary of latency statistics in microseconds
+    """
+    results = {}
+    for name, cache_size in (("uncached", 0), ("cached", 16384)):
+        env = ReinforcedShrineAdventureEnv(transition_cache_size=cache_size)
+        results[name] = summarize(time_steps(env, random_policy(), repeats, warmup))
+        if env.transition_cache is not None:
+            results[name]["cache_hit_rate"] = env.transition_cache.hit_rate
+    return results
+
+
+def benchmark_throughput(num_steps=5000, warmup=200, transition_cache_size=0):
+    """Measure end-to-end steps per second (resets included) for each policy.
+
+    Args:
+        num_steps: Number of timed steps per policy
+        warmup: Number of untimed steps per policy
+        transition_cache_size: Transition cache size (0 measures the interpreter)
+
+    Returns:
+        Dictionary of policy name -> throughput statistics
+    """
+    results = {}
+    for name, policy in (("random", random_policy()), ("fixed", fixed_policy())):
+        env = ReinforcedShrineAdventureEnv(transition_cache_size=transition_cache_size)
+        observation, _ = env.reset()
+        episodes = 0
+        start = time.perf_counter()
+        for i in range(-warmup, num_steps):
+            if i == 0:
+                start = time.perf_counter()
+                episodes = 0
+            observation, _, done, truncated, _ = env.step(policy(observation))
+            if done or truncated:
+                episodes += 1
+                observation, _ = env.reset()
+        elapsed = time.perf_counter() - start
+
+        results[name] = {
+            "steps_per_second": num_steps / elapsed,
+            "episodes_per_second": episodes / elapsed,
+            "mean_episode_length": num_steps / max(episodes, 1),
+        }
+    return results
+
+
+def benchmark_breakdown(num_steps=2000, warmup=200, transition_cache_size=0):
+    """Split step time between the interpreter and the env's own work.
+
+    The env methods in BREAKDOWN_METHODS are wrapped with timers on the
+    instance. "state" is the part of a transition outside the interpreter
+    (saving the ink state, hashing it, reading variables, cache lookups),
+    and "other" is whatever step() spends outside every timed method.
+
+    Args:
+        num_steps: Number of timed steps
+        warmup: Number of untimed steps taken first
+        transition_cache_size: Transition cache size (0 measures the interpreter)
+
+    Returns:
+        Dictionary of per-step microseconds and fractions for each category
+    """
+    env = ReinforcedShrineAdventureEnv(transition_cache_size=transition_cache_size)
+    totals = dict.fromkeys(BREAKDOWN_METHODS, 0.0)
+    in_step = False
+
+    def timed(name, method):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            # reset() builds an observation too; only count calls made by step()
+            if in_step:
+                totals[name] += time.perf_counter() - start
+            return result
+
+        return wrapper
+
+    for name in BREAKDOWN_METHODS:
+        setattr(env, name, timed(name, getattr(env, name)))
+
+    policy = random_policy()
+    observation, _ = env.reset()
+    step_time = 0.0
+    for i in range(-warmup, num_steps):
+        if i == 0:
+            totals = dict.fromkeys(BREAKDOWN_METHODS, 0.0)
+            step_time = 0.0
+        action = policy(observation)
+        in_step = True
+        start = time.perf_counter()
+        observation, _, done, truncated, _ = env.step(action)
+        step_time += time.perf_counter() - start
+        in_step = False
+        if done or truncated:
+            observation, _ = env.reset()
+
+    categories = {
+        "interpreter": totals["sync_story"] + totals["_run_story"],
+        "reward": totals["calculate_reward"],
+        "observation": totals["_get_observation"],
+    }
+    categories["state"] = totals["_transition"] - categories["interpreter"]
+    categories["other"] = (
+        step_time
+        - totals["_transition"]
+        - sum(totals[name] for name in ("calculate_reward", "_get_observation"))
+    )
+
+    return {
+        "step_us": step_time / num_steps * 1e6,
+        **{f"{name}_us": value / num_steps * 1e6 for name, value in categories.items()},
+        **{f"{name}_fraction": value / step_time for name, value in categories.items()},
+    }
+
+
+def git_commit():
+    """Return the current git commit, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(repeats=1000, warmup=50):
+    """Run the whole suite.
+
+    Args:
+        repeats: Number of timed calls for the latency benchmarks
+        warmup: Number of untimed calls made before each benchmark
+
+    Returns:
+        Dictionary of results, ready to be saved as JSON
+    """
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": repeats,
+        "warmup": warmup,
+        "reset": benchmark_reset(repeats, warmup),
+        "step": benchmark_step(repeats, warmup),
+        "throughput": {
+            "uncached": benchmark_throughput(5 * repeats, 4 * warmup, 0),
+            "cached": benchmark_throughput(5 * repeats, 4 * warmup, 16384),
+        },
+        "breakdown": benchmark_breakdown(2 * repeats, 4 * warmup),
+    }
+
+
+def main():
+    """Run the benchmark suite, print a summary and optionally save it as JSON."""
+    parser = argparse.ArgumentParser(description="Benchmark the environment.")
+    parser.add_argument("--repeats", type=int, default=1000, help="Timed calls")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed calls")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeats, args.warmup)
+
+    reset = results["reset"]
+    print("Reset latency")
+    print(f"  snapshot: {reset['snapshot_median_us']:.1f} us (median)")
+    print(f"  re-parse: {reset['reparse_median_us']:.1f} us (median)")
+    print(f"  speedup:  {reset['speedup']:.1f}x")
+
+    print("Step latency (random policy)")
+    for name, stats in results["step"].items():
+        print(f"  {name}: {stats['median_us']:.1f} us (median)")
+
+    print("Throughput")
+    for cache, policies in results["throughput"].items():
+        for name, stats in policies.items():
+            print(f"  {name} ({cache}): {stats['steps_per_second']:.0f} steps/s")
+
+    breakdown = results["breakdown"]
+    print(f"Step breakdown (uncached, {breakdown['step_us']:.1f} us per step)")
+    for name in ("interpreter", "state", "reward", "observation", "other"):
+        print(
+            f"  {name}: {breakdown[f'{name}_us']:.1f} us "
+            f"({breakdown[f'{name}_fraction']:.1%})"
+        )
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
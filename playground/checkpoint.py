@@ -0,0 +1,165 @@
+"""
+Small, frequent training checkpoints written in the background.
+
+A checkpoint holds only what training changes: the actor-critic heads
+(feature_combiner, actor, critic), the optimizer state and the training
+counters. The frozen encoder is described by its identity in a manifest,
+not stored, so a checkpoint is a few megabytes at most.
+
+The module includes:
+- CheckpointWriter: Snapshots state on the training thread, writes it on
+  a background thread
+- latest_checkpoint: Path of the newest checkpoint, from the manifest
+
+Layout:
+    <directory>/checkpoint_000050.pt   heads, optimizer and counters
+    <directory>/manifest.json          encoder identity and the checkpoints
+
+Key features:
+- Training only waits for a copy of the weights, never for the disk
+- Files and the manifest appear atomically (written to a temp file, then renamed)
+- Only the newest few checkpoints are kept
+
+Usage:
+    python playground/train.py --checkpoint-every 50
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import torch
+from agent import trainable_state_dict
+
+DEFAULT_CHECKPOINTS = "results/checkpoints"
+
+
+def _to_cpu(value):
+    """Copy every tensor in a nested structure to the CPU."""
+    if isinstance(value, torch.Tensor):
+        return value.detach().to("cpu", copy=True)
+    if isinstance(value, dict):
+        return {key: _to_cpu(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_cpu(item) for item in value)
+    return value
+
+
+def _atomic_write(path, write):
+    """Write a file through a temp file in the same directory, then rename it."""
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    with open(tmp_path, "wb") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class CheckpointWriter:
+    """Writes head-only checkpoints on a background thread.
+
+    The encoder identity (TextEncoder.identity()) goes into every
+    checkpoint and the manifest; the newest `keep` checkpoints are kept.
+    """
+
+    def __init__(self, directory=DEFAULT_CHECKPOINTS, encoder=None, keep=3):
+        self.directory = directory
+        self.encoder = encoder
+        self.keep = keep
+        self.checkpoints = []
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def save(self, agent, step, **counters):
+        """Snapshot the agent's trainable state and queue it for writing.
+
+        Args:
+            agent: ShrineAgent being trained
+            step: Training counter naming the checkpoint (e.g. the episode)
+            **counters: Other training counters and statistics to store
+
+        Raises:
+            RuntimeError: If an earlier background write failed
+        """
+        self._raise_error()
+        state = {
+            "model_state_dict": _to_cpu(trainable_state_dict(agent.policy)),
+            "optimizer_state_dict": _to_cpu(agent.optimizer.state_dict()),
+            "encoder": self.encoder,
+            "step": step,
+            "counters": _to_cpu(counters),
+        }
+        self.queue.put(state)
+
+    def _write_loop(self):
+        """Write queued checkpoints until a None is queued."""
+        while True:
+            state = self.queue.get()
+            try:
+                if state is not None and self.error is None:
+                    self._write(state)
+            except Exception as error:  # Surfaced on the next save() or close()
+                self.error = error
+            finally:
+                self.queue.task_done()
+            if state is None:
+                break
+
+    def _write(self, state):
+        """Write one checkpoint, update the manifest and prune old files."""
+        name = f"checkpoint_{state['step']:06d}.pt"
+        _atomic_write(
+            os.path.join(self.directory, name), lambda f: torch.save(state, f)
+        )
+        self.checkpoints.append(name)
+
+        stale, self.checkpoints = (
+            self.checkpoints[: -self.keep],
+            self.checkpoints[-self.keep :],
+        )
+        manifest = {
+            "encoder": self.encoder,
+            "latest": name,
+            "step": state["step"],
+            "saved_at": time.time(),
+            "checkpoints": self.checkpoints,
+        }
+        _atomic_write(
+            os.path.join(self.directory, "manifest.json"),
+            lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")),
+        )
+
+        # Only after the manifest stops listing them
+        for old in stale:
+            os.remove(os.path.join(self.directory, old))
+
+    def _raise_error(self):
+        """Re-raise a failed background write on the training thread."""
+        if self.error is not None:
+            raise RuntimeError("Writing a checkpoint failed") from self.error
+
+    def flush(self):
+        """Wait until every queued checkpoint is on disk."""
+        self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Write the remaining checkpoints and stop the background thread."""
+        self.queue.put(None)
+        self.thread.join()
+        self._raise_error()
+
+
+def latest_checkpoint(directory=DEFAULT_CHECKPOINTS):
+    """Return the path of the newest checkpoint in the manifest, or None."""
+    try:
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    return os.path.join(directory, manifest["latest"])
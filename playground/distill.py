@@ -0,0 +1,304 @@
+"""
+Distills the frozen DistilBERT encoder into a small student for CPU inference.
+
+The student (encoders.StudentNetwork) is a few-layer transformer over the
+same tokenizer vocabulary, trained to reproduce the teacher's CLS
+embeddings on the story's text. Its output has the teacher's size, so the
+actor-critic heads are unchanged and it plugs in with --encoder student.
+
+The module includes:
+- observation_texts: Observation texts seen by a random policy
+- augment: Cheap paraphrase-like variants of a text
+- distill: Trains and evaluates a student, then saves it
+
+Key features:
+- Corpus of story fragments, observed texts and augmented variants
+- Teacher targets computed once, in length-sorted batches
+- Cosine plus mean squared error loss, evaluated on held-out texts
+- Teacher and student latency reported side by side
+
+Usage:
+    python playground/distill.py --output results/student_encoder.pt
+    python playground/train.py --encoder student
+"""
+
+import argparse
+import itertools
+import os
+import random
+import re
+import time
+import numpy as np
+import torch
+import torch.nn.functional as F
+from benchmark import random_policy, summarize, time_calls
+from encoders import (
+    DEFAULT_STUDENT,
+    BertEncoder,
+    StudentEncoder,
+    StudentNetwork,
+    story_corpus,
+)
+from env import ReinforcedShrineAdventureEnv
+from execution import ExecutionPolicy
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def observation_texts(num_steps=2000, seed=0):
+    """Collect the distinct observation texts a random policy runs into."""
+    env = ReinforcedShrineAdventureEnv()
+    policy = random_policy(seed)
+    observation, _ = env.reset()
+    texts = {observation["text"]}
+    for _ in range(num_steps):
+        observation, _, done, truncated, _ = env.step(policy(observation))
+        texts.add(observation["text"])
+        if done or truncated:
+            observation, _ = env.reset()
+            texts.add(observation["text"])
+    return sorted(texts)
+
+
+def augment(text, rng, corpus):
+    """Return a paraphrase-like variant of a text.
+
+    Picks one of: word dropout, swapping neighbouring words, keeping a run
+    of sentences, or appending another corpus text (observations grow by
+    concatenation as the story goes on).
+
+    Args:
+        text: Text to vary
+        rng: random.Random instance
+        corpus: Texts to draw appended passages from
+
+    Returns:
+        The augmented text
+    """
+    words = text.split()
+    choice = rng.randrange(4)
+    if choice == 0 and len(words) > 3:
+        kept = [word for word in words if rng.random() > 0.1]
+        return " ".join(kept or words)
+    if choice == 1 and len(words) > 3:
+        for _ in range(max(1, len(words) // 10)):
+            i = rng.randrange(len(words) - 1)
+            words[i], words[i + 1] = words[i + 1], words[i]
+        return " ".join(words)
+    sentences = SENTENCE_PATTERN.split(text)
+    if choice == 2 and len(sentences) > 1:
+        start = rng.randrange(len(sentences))
+        stop = rng.randrange(start, len(sentences)) + 1
+        return " ".join(sentences[start:stop])
+    return f"{text}\n{rng.choice(corpus)}"
+
+
+def teacher_embeddings(teacher, texts, batch_size=64):
+    """Encode texts with the teacher in length-sorted batches (float32, CPU)."""
+    targets = torch.empty(len(texts), teacher.output_dim)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), batch_size):
+        rows = order[start : start + batch_size]
+        targets[rows] = teacher.encode([texts[i] for i in rows]).float().cpu()
+    return targets
+
+
+def distill(
+    output=DEFAULT_STUDENT,
+    teacher_name="distilbert-base-uncased",
+    num_steps=2000,
+    augmentations=4,
+    epochs=30,
+    batch_size=64,
+    dim=128,
+    num_layers=2,
+    num_heads=4,
+    lr=1e-3,
+    device=None,
+    seed=0,
+):
+    """Train a student to match the teacher's CLS embeddings and save it.
+
+    Args:
+        output: Path of the saved student
+        teacher_name: Hugging Face model to distill
+        num_steps: Random-policy steps to collect observation texts from
+        augmentations: Augmented variants per training text
+        epochs: Passes over the training set
+        batch_size: Texts per optimization step
+        dim: Student hidden size
+        num_layers: Student transformer layers
+        num_heads: Student attention heads
+        lr: AdamW learning rate
+        device: Device to train on (defaults to CUDA when available)
+        seed: Seed for the split, augmentations and initialization
+
+    Returns:
+        Dictionary of corpus, training and evaluation statistics
+    """
+    rng = random.Random(seed)
+    torch.manual_seed(seed)
+    execution = ExecutionPolicy(device, "fp32")
+
+    # The student never trains on a held-out text or its augmentations (the
+    # teacher and its tokenizer were pretrained independently of this split)
+    texts = sorted(set(story_corpus()) | set(observation_texts(num_steps, seed)))
+    rng.shuffle(texts)
+    num_val = max(1, len(texts) // 10)
+    val_texts, train_texts = texts[:num_val], texts[num_val:]
+    train_texts = train_texts + [
+        augment(text, rng, train_texts)
+        for text in train_texts
+        for _ in range(augmentations)
+    ]
+
+    start = time.perf_counter()
+    teacher = BertEncoder(teacher_name, execution)
+    _, tokenizer = teacher.loaded()
+    train_targets = teacher_embeddings(teacher, train_texts)
+    val_targets = teacher_embeddings(teacher, val_texts)
+    teacher_seconds = time.perf_counter() - start
+
+    config = {
+        "vocab_size": len(tokenizer),
+        "output_dim": teacher.output_dim,
+        "dim": dim,
+        "num_layers": num_layers,
+        "num_heads": num_heads,
+        "max_length": 256,
+        "pad_token_id": tokenizer.pad_token_id,
+    }
+    student = StudentNetwork(**config).to(execution.device)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=lr)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(
+        optimizer, epochs * -(-len(train_texts) // batch_size)
+    )
+
+    def run_student(batch_texts):
+        """Tokenize like the teacher and run the student."""
+        tokens = tokenizer(
+            batch_texts,
+            return_tensors="pt",
+            max_length=config["max_length"],
+            truncation=True,
+            padding=True,
+        )
+        return student(
+            tokens.input_ids.to(execution.device),
+            tokens.attention_mask.to(execution.device),
+        )
+
+    def loss_fn(predicted, target):
+        """Direction (cosine) and scale (squared error) of the embedding."""
+        cosine = F.cosine_similarity(predicted, target, dim=1).mean()
+        return (1 - cosine) + F.mse_loss(predicted, target), cosine
+
+    @torch.no_grad()
+    def evaluate():
+        """Mean cosine similarity to the teacher on the held-out texts."""
+        student.eval()
+        predicted = torch.cat(
+            [
+                run_student(val_texts[i : i + batch_size])
+                for i in range(0, len(val_texts), batch_size)
+            ]
+        )
+        student.train()
+        return loss_fn(predicted, val_targets.to(execution.device))[1].item()
+
+    start = time.perf_counter()
+    for epoch in range(epochs):
+        losses = []
+        for batch in torch.randperm(len(train_texts)).split(batch_size):
+            predicted = run_student([train_texts[i] for i in batch])
+            loss, _ = loss_fn(predicted, train_targets[batch].to(execution.device))
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            losses.append(loss.item())
+        if epoch % 5 == 0 or epoch == epochs - 1:
+            print(
+                f"Epoch {epoch}: loss {np.mean(losses):.4f}, "
+                f"held-out cosine {evaluate():.4f}"
+            )
+    train_seconds = time.perf_counter() - start
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    torch.save(
+        {
+            "config": config,
+            "state_dict": {k: v.cpu() for k, v in student.state_dict().items()},
+            "teacher": teacher_name,
+        },
+        output + ".tmp",
+    )
+    os.replace(output + ".tmp", output)
+
+    # Single-text latency on CPU, where the gameplay boxes run
+    cpu = ExecutionPolicy("cpu", "fp32")
+    if execution.device.type != "cpu":
+        teacher = BertEncoder(teacher_name, cpu)
+    cpu_student = StudentEncoder(output, cpu)
+    teacher_model, _ = teacher.loaded()
+    cycle = itertools.cycle(val_texts)
+    teacher_latency = time_calls(lambda: teacher.encode([next(cycle)]), 50, 5)
+    student_latency = time_calls(lambda: cpu_student.encode([next(cycle)]), 50, 5)
+
+    return {
+        "train_texts": len(train_texts),
+        "val_texts": len(val_texts),
+        "teacher_seconds": teacher_seconds,
+        "train_seconds": train_seconds,
+        "val_cosine": evaluate(),
+        "teacher_parameters": sum(p.numel() for p in teacher_model.parameters()),
+        "student_parameters": sum(p.numel() for p in student.parameters()),
+        "teacher_latency": summarize(teacher_latency),
+        "student_latency": summarize(student_latency),
+    }
+
+
+def main():
+    """Distill the encoder and print a summary."""
+    parser = argparse.ArgumentParser(description="Distill BERT into a student.")
+    parser.add_argument("--output", default=DEFAULT_STUDENT, help="Student path")
+    parser.add_argument("--steps", type=int, default=2000, help="Corpus steps")
+    parser.add_argument("--augment", type=int, default=4, help="Variants per text")
+    parser.add_argument("--epochs", type=int, default=30, help="Training epochs")
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch size")
+    parser.add_argument("--dim", type=int, default=128, help="Student hidden size")
+    parser.add_argument("--layers", type=int, default=2, help="Student layers")
+    parser.add_argument("--heads", type=int, default=4, help="Attention heads")
+    parser.add_argument("--device", default=None, help="Device (cuda, cpu, ...)")
+    args = parser.parse_args()
+
+    summary = distill(
+        args.output,
+        num_steps=args.steps,
+        augmentations=args.augment,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        dim=args.dim,
+        num_layers=args.layers,
+        num_heads=args.heads,
+        device=args.device,
+    )
+    print(f"Student saved to {args.output}")
+    print(
+        f"Corpus: {summary['train_texts']} training, "
+        f"{summary['val_texts']} held-out texts"
+    )
+    print(f"Held-out cosine similarity: {summary['val_cosine']:.4f}")
+    print(
+        f"Parameters: {summary['teacher_parameters'] / 1e6:.1f}M teacher, "
+        f"{summary['student_parameters'] / 1e6:.1f}M student"
+    )
+    print(
+        f"CPU latency per text: "
+        f"{summary['teacher_latency']['median_us'] / 1e3:.1f} ms teacher, "
+        f"{summary['student_latency']['median_us'] / 1e3:.2f} ms student"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Offline store of precomputed text embeddings.
+
+Enumerates every observation text the environment can produce (see
+story_tree.reachable_texts), runs the frozen text encoder (DistilBERT by
+default) over all of them in large batches and saves the embeddings, so
+the agent can look them up instead of running the encoder.
+
+The module includes:
+- build_embedding_store: Encodes every reachable text and writes the store
+- EmbeddingStore: Memory-mapped, read-only lookup by text hash
+
+Layout:
+    <directory>/embeddings.npy  float16 matrix, one row per text
+    <directory>/index.json      model name, story hash and text hash -> row
+
+Key features:
+- Rows keyed on interning.string_id, the same hash the embedding cache uses
+- Texts encoded in length-sorted batches to keep padding low
+- The store is memory-mapped, so worker processes share its pages
+- A store built for an older version of the story is reported on load
+
+Usage:
+    python playground/embedding_store.py --workers 8
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+import torch
+from encoders import BertEncoder
+from execution import ExecutionPolicy
+from interning import string_id
+from story_tree import reachable_texts, story_hash
+
+DEFAULT_STORE = "results/embedding_store"
+
+
+class EmbeddingStore:
+    """Read-only, memory-mapped text embeddings keyed on text hash."""
+
+    def __init__(self, directory=DEFAULT_STORE):
+        with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.model_name = index["model_name"]
+        self.story_hash = index["story_hash"]
+        if self.story_hash != story_hash():
+            # Rows are keyed on the text itself, so they stay correct; texts the
+            # story has changed are just missing and get encoded on the fly
+            print(
+                f"Warning: the embedding store in {directory} was built for another "
+                "version of the story; rebuild it with "
+                "`python playground/embedding_store.py`."
+            )
+        self.rows = {int(text_id): row for text_id, row in index["rows"].items()}
+        self.embeddings = np.load(
+            os.path.join(directory, "embeddings.npy"), mmap_mode="r"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, text_ids):
+        """Find the stored embeddings of a batch of text hashes.
+
+        Args:
+            text_ids: Sequence of string_id() values
+
+        Returns:
+            Tuple of (positions in text_ids that were found, float16 array
+            holding their embeddings in the same order)
+        """
+        positions, rows = [], []
+        for i, text_id in enumerate(text_ids):
+            row = self.rows.get(text_id)
+            if row is not None:
+                positions.append(i)
+                rows.append(row)
+        self.hits += len(rows)
+        self.misses += len(text_ids) - len(rows)
+        return positions, self.embeddings[rows]
+
+    def __contains__(self, text):
+        return string_id(text) in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def build_embedding_store(
+    directory=DEFAULT_STORE,
+    model_name="distilbert-base-uncased",
+    batch_size=128,
+    max_steps=20,
+    num_workers=None,
+    num_layers=None,
+):
+    """Encode every reachable observation text and save the store.
+
+    Args:
+        directory: Output directory
+        model_name: Hugging Face model the agent encodes text with
+        batch_size: Texts per BERT forward pass
+        max_steps: Episode step cap bounding the enumeration
+        num_workers: Worker processes for the enumeration
+        num_layers: Transformer layers to keep (None: all)
+
+    Returns:
+        Dictionary describing the build
+    """
+    start = time.perf_counter()
+    texts = reachable_texts(max_steps=max_steps, num_workers=num_workers)
+    enumerated = time.perf_counter()
+
+    encoder = BertEncoder(model_name, ExecutionPolicy(), num_layers=num_layers)
+
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, "embeddings.npy.tmp")
+    embeddings = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float16, shape=(len(texts), encoder.output_dim)
+    )
+
+    # Similar lengths share a batch, so little compute goes into padding
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for batch_start in range(0, len(order), batch_size):
+        rows = order[batch_start : batch_start + batch_size]
+        encoded = encoder.encode([texts[i] for i in rows])
+        embeddings[rows] = encoded.to("cpu", torch.float16).numpy()
+    embeddings.flush()
+    del embeddings
+    os.replace(tmp_path, os.path.join(directory, "embeddings.npy"))
+
+    index = {
+        "model_name": encoder.name,
+        "story_hash": story_hash(),
+        "max_steps": max_steps,
+        "rows": {str(string_id(text)): row for row, text in enumerate(texts)},
+    }
+    with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    return {
+        "texts": len(texts),
+        "enumerate_seconds": enumerated - start,
+        "encode_seconds": time.perf_counter() - enumerated,
+    }
+
+
+def main():
+    """Build the embedding store."""
+    parser = argparse.ArgumentParser(description="Precompute text embeddings.")
+    parser.add_argument("--output", default=DEFAULT_STORE, help="Store directory")
+    parser.add_argument("--batch-size", type=int, default=128, help="BERT batch size")
+    parser.add_argument("--max-steps", type=int, default=20, help="Episode step cap")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    parser.add_argument("--layers", type=int, default=None, help="BERT layers kept")
+    args = parser.parse_args()
+
+    summary = build_embedding_store(
+        args.output,
+        batch_size=args.batch_size,
+        max_steps=args.max_steps,
+        num_workers=args.workers,
+        num_layers=args.layers,
+    )
+    print(f"Encoded {summary['texts']} texts into {args.output}")
+    print(f"Enumeration: {summary['enumerate_seconds']:.1f}s")
+    print(f"Encoding: {summary['encode_seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
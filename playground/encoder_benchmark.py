@@ -0,0 +1,193 @@
+"""
+CPU benchmark comparing the pluggable text encoders.
+
+Measures, for each encoder kind (see encoders.ENCODERS):
+- Construction time (model loading or vocabulary fitting)
+- Peak resident memory added by constructing it
+- encode() latency for a single text and for a batch of texts
+- Feature size (output_dim)
+- Padding waste of the token-based encoders
+- Mean episode return of a short training run with fixed seeds
+
+The distilled student is included once distill.py has saved one.
+Encoders are built from lightest to heaviest, so the peak-RSS deltas of
+the lexical encoders are not hidden by BERT's. The training run is short,
+so its returns rank encoders rather than predict a full train.py run.
+
+Usage:
+    python playground/encoder_benchmark.py --output results/encoder_benchmark.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import resource
+import time
+import numpy as np
+import torch
+from agent import ShrineAgent
+from benchmark import git_commit, summarize, time_calls
+from encoders import DEFAULT_STUDENT, make_encoder
+from env import ReinforcedShrineAdventureEnv, STORY_VARIABLES
+from execution import ExecutionPolicy
+from policy_benchmark import collect_observations
+from train import run_episodes
+
+
+def peak_rss_mb():
+    """Return the process's peak resident set size in MiB (Linux units)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reward_run(encoder, num_episodes=200, seed=0):
+    """Train a fresh agent on an encoder for a few episodes with fixed seeds.
+
+    Args:
+        encoder: TextEncoder the agent uses
+        num_episodes: Training episodes
+        seed: Seed for torch and numpy (the story itself is deterministic)
+
+    Returns:
+        Dictionary of per-episode returns, their mean and the mean over the
+        final fifth of the run
+    """
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+    agent = ShrineAgent(
+        state_size=768 + len(STORY_VARIABLES),
+        action_size=4,
+        device="cpu",
+        precision="fp32",
+        encoder=encoder,
+    )
+    env = ReinforcedShrineAdventureEnv()
+
+    start = time.perf_counter()
+    returns = [
+        float(total_reward)
+        for total_reward, _, _ in run_episodes(
+            env, agent, num_episodes, lambda: agent.c2
+        )
+    ]
+    window = max(1, num_episodes // 5)
+    return {
+        "episodes": num_episodes,
+        "seed": seed,
+        "seconds": time.perf_counter() - start,
+        "mean_return": float(np.mean(returns)),
+        "final_mean_return": float(np.mean(returns[-window:])),
+        "returns": returns,
+    }
+
+
+def benchmark_encoder(
+    kind, texts, batch_size=32, repeats=50, warmup=5, num_episodes=200, seed=0
+):
+    """Time construction and encode() calls of one encoder on CPU.
+
+    Args:
+        kind: Encoder kind (see encoders.ENCODERS)
+        texts: Observation texts to encode
+        batch_size: Texts per batched encode() call
+        repeats: Number of timed calls per configuration
+        warmup: Number of untimed calls per configuration
+        num_episodes: Training episodes for the return (0 skips training)
+        seed: Seed of the training run
+
+    Returns:
+        Dictionary of construction, memory, latency and return statistics
+    """
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    encoder = make_encoder(kind, ExecutionPolicy("cpu", "fp32"))
+    construct_seconds = time.perf_counter() - start
+    rss_delta = peak_rss_mb() - rss_before
+
+    singles = itertools.cycle(texts)
+    batches = itertools.cycle(
+        [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    )
+    single = time_calls(lambda: encoder.encode([next(singles)]), repeats, warmup)
+    batch = time_calls(lambda: encoder.encode(next(batches)), repeats, warmup)
+
+    return {
+        "encoder": encoder.identity(),
+        "construct_seconds": construct_seconds,
+        "peak_rss_delta_mb": rss_delta,
+        "encode_single": summarize(single),
+        "encode_batch": summarize(batch),
+        "batch_size": batch_size,
+        "padding": encoder.padding_stats(),
+        "training": reward_run(encoder, num_episodes, seed) if num_episodes else None,
+    }
+
+
+def main():
+    """Run the encoder benchmark, print a summary and optionally save it."""
+    parser = argparse.ArgumentParser(description="Benchmark the text encoders.")
+    parser.add_argument("--repeats", type=int, default=50, help="Timed calls")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed calls")
+    parser.add_argument("--batch", type=int, default=32, help="Texts per batch")
+    parser.add_argument("--episodes", type=int, default=200, help="Training episodes")
+    parser.add_argument("--seed", type=int, default=0, help="Training seed")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    texts = [observation["text"] for observation, *_ in collect_observations(256)]
+
+    results = {
+        "commit": git_commit(),
+        "threads": torch.get_num_threads(),
+        "episodes": args.episodes,
+        "seed": args.seed,
+        "encoders": {},
+    }
+    kinds = ["hashing", "tfidf", "bert"]
+    if os.path.exists(DEFAULT_STUDENT):
+        kinds.insert(2, "student")
+    for kind in kinds:
+        stats = benchmark_encoder(
+            kind,
+            texts,
+            args.batch,
+            args.repeats,
+            args.warmup,
+            args.episodes,
+            args.seed,
+        )
+        results["encoders"][kind] = stats
+        print(f"{kind} ({stats['encoder']['output_dim']} features):")
+        print(f"  construct: {stats['construct_seconds']:.2f} s")
+        print(f"  peak RSS:  +{stats['peak_rss_delta_mb']:.0f} MiB")
+        print(f"  single:    {stats['encode_single']['median_us'] / 1e3:.3f} ms")
+        print(
+            f"  batch:     {stats['encode_batch']['median_us'] / 1e3:.3f} ms "
+            f"({args.batch} texts)"
+        )
+        if stats["padding"]:
+            print(
+                f"  padding:   {stats['padding']['waste']:.1%} of tokens "
+                f"(unbucketed {stats['padding']['unbucketed_waste']:.1%})"
+            )
+        if stats["training"]:
+            training = stats["training"]
+            print(
+                f"  return:    {training['mean_return']:.2f} mean, "
+                f"{training['final_mean_return']:.2f} over the last "
+                f"{max(1, args.episodes // 5)} episodes "
+                f"({training['seconds']:.0f} s to train)"
+            )
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
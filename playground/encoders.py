@@ -0,0 +1,448 @@
+"""
+Pluggable text encoders for the actor-critic.
+
+Every encoder maps a batch of texts to a (N, output_dim) float tensor and
+is frozen, so a text always gets the same features. The embedding cache
+and embedding store therefore work with any of them, and feature_combiner
+sizes itself from output_dim.
+
+The module includes:
+- TextEncoder: The interface (kind, name, output_dim, encode, identity)
+- TokenEncoder: Base for models over BERT tokens, with length bucketing
+- BertEncoder: CLS embeddings of pretrained DistilBERT (the default)
+- HashingEncoder: Signed hashed bag of word n-grams, pure NumPy
+- TfidfEncoder: TF-IDF over a vocabulary fitted on the story's own text
+- StudentNetwork: Small transformer distilled from BERT (see distill.py)
+- StudentEncoder: Runs a saved student over BERT's tokenizer
+- make_encoder: Build an encoder from its kind
+
+Key features:
+- Lexical encoders need no model download and run in microseconds
+- Hashes are process-independent (CRC32), so rollout workers agree
+- The TF-IDF vocabulary is fitted deterministically from the story JSON
+- Token models pad per length bucket, not to the batch's longest text
+"""
+
+import json
+import os
+import re
+import zlib
+import numpy as np
+import torch
+import torch.nn as nn
+from transformers import (
+    AutoConfig,
+    DistilBertTokenizer,
+    DistilBertModel,
+    PreTrainedTokenizerBase,
+)
+from env import STORY_PATH
+from execution import ExecutionPolicy
+from model_bundle import DEFAULT_BUNDLES, pretrained_source
+
+ENCODERS = ("bert", "hashing", "tfidf", "student")
+
+DEFAULT_STUDENT = "results/student_encoder.pt"
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def word_ngrams(text, ngram_range=(1, 2)):
+    """Return the lowercased word n-grams of a text."""
+    words = WORD_PATTERN.findall(text.lower())
+    low, high = ngram_range
+    return [
+        " ".join(words[i : i + n])
+        for n in range(low, high + 1)
+        for i in range(len(words) - n + 1)
+    ]
+
+
+def story_corpus(path=STORY_PATH):
+    """Return every text fragment of the compiled story (its "^" strings)."""
+    with open(path, "r", encoding="utf-8") as file:
+        story = json.load(file)
+
+    fragments = []
+    stack = [story["root"]]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            if node.startswith("^") and node[1:].strip():
+                fragments.append(node[1:])
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+    return fragments
+
+
+def _l2_normalize(features):
+    """Scale each row to unit length (all-zero rows are left alone)."""
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    np.divide(features, norms, out=features, where=norms > 0)
+    return features
+
+
+class TextEncoder:
+    """Interface of a frozen text encoder."""
+
+    kind = None
+    name = None
+    output_dim = None
+
+    def encode(self, texts):
+        """Encode a list of texts into a (N, output_dim) tensor."""
+        raise NotImplementedError
+
+    def identity(self):
+        """Describe the encoder, e.g. for checkpoint manifests."""
+        return {"kind": self.kind, "name": self.name, "output_dim": self.output_dim}
+
+    def padding_stats(self) -> dict | None:
+        """Return padding counters (None for encoders that do not pad)."""
+        return None
+
+
+class TokenEncoder(TextEncoder):
+    """Base for encoders running a model over BERT token ids.
+
+    Observation texts accumulate, so one long text would pad a whole batch
+    to its length. Texts are instead sorted by token count and run in
+    sub-batches of similar length, each padded only to its own longest
+    text and holding at most max_batch_tokens (padded) tokens.
+    """
+
+    max_length = 256
+    max_batch_tokens = 8192
+
+    # Set by subclasses, model and tokenizer possibly only once load() runs
+    execution: ExecutionPolicy
+    model: nn.Module | None = None
+    tokenizer: PreTrainedTokenizerBase | None = None
+
+    def __init__(self):
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.unbucketed_tokens = 0
+
+    def load(self):
+        """Load the model and tokenizer if that is deferred (a no-op here)."""
+
+    def loaded(self):
+        """Return the (model, tokenizer) pair, loading them first if needed."""
+        self.load()
+        if self.model is None or self.tokenizer is None:
+            raise RuntimeError(f"{type(self).__name__} has no model or tokenizer.")
+        return self.model, self.tokenizer
+
+    def freeze(self, model: nn.Module) -> nn.Module:
+        """Put a model in eval mode, without gradients, on the execution device."""
+        model.eval()
+        for param in model.parameters():
+            param.requires_grad = False
+        return model.to(self.execution.device)
+
+    def run_model(self, model, input_ids, attention_mask):
+        """Run the model on one padded sub-batch, returning (N, output_dim)."""
+        raise NotImplementedError
+
+    def encode(self, texts):
+        """Tokenize texts and encode them in length-bucketed sub-batches."""
+        model, tokenizer = self.loaded()
+        tokens = tokenizer(texts, max_length=self.max_length, truncation=True)
+        input_ids = tokens.input_ids
+        lengths = np.array([len(ids) for ids in input_ids])
+
+        # In ascending length order, a sub-batch is closed once padding it to
+        # the next (longest yet) text would exceed the token budget
+        buckets, bucket = [], []
+        for i in np.argsort(lengths, kind="stable"):
+            if bucket and (len(bucket) + 1) * lengths[i] > self.max_batch_tokens:
+                buckets.append(bucket)
+                bucket = []
+            bucket.append(i)
+        buckets.append(bucket)
+
+        device = self.execution.device
+        outputs = []
+        for rows in buckets:
+            tokens = tokenizer.pad(
+                {"input_ids": [input_ids[i] for i in rows]}, return_tensors="pt"
+            )
+            with torch.no_grad(), self.execution.autocast():
+                outputs.append(
+                    self.run_model(
+                        model,
+                        tokens.input_ids.to(device, non_blocking=True),
+                        tokens.attention_mask.to(device, non_blocking=True),
+                    )
+                )
+            self.padded_tokens += len(rows) * int(lengths[rows[-1]])
+
+        self.real_tokens += int(lengths.sum())
+        self.unbucketed_tokens += len(texts) * int(lengths.max(initial=0))
+
+        # Back to the caller's order
+        encoded = torch.cat(outputs)
+        result = torch.empty_like(encoded)
+        result[torch.tensor(np.concatenate(buckets), device=device)] = encoded
+        return result
+
+    def padding_stats(self) -> dict | None:
+        """Return token counts and the fraction of computed tokens that were padding.
+
+        "unbucketed_waste" is what padding every call to its longest text
+        would have wasted, for comparison.
+        """
+        return {
+            "real_tokens": self.real_tokens,
+            "padded_tokens": self.padded_tokens,
+            "waste": 1 - self.real_tokens / max(self.padded_tokens, 1),
+            "unbucketed_waste": 1 - self.real_tokens / max(self.unbucketed_tokens, 1),
+        }
+
+
+class BertEncoder(TokenEncoder):
+    """CLS embeddings of a frozen, pretrained DistilBERT model.
+
+    With num_layers set, only the first num_layers transformer layers are
+    kept; the CLS embedding is read after the last kept layer. The model
+    and tokenizer come from the local bundle (see model_bundle.py), or
+    from the Hugging Face hub when there is none and allow_hub is set.
+    """
+
+    kind = "bert"
+    output_dim = 768
+
+    def __init__(
+        self,
+        model_name="distilbert-base-uncased",
+        execution=None,
+        lazy=False,
+        num_layers=None,
+        bundle_root: str | None = DEFAULT_BUNDLES,
+        allow_hub=False,
+    ):
+        super().__init__()
+        self.model_name = model_name
+        self.num_layers = num_layers
+        self.bundle_root = bundle_root
+        self.allow_hub = allow_hub
+        # Truncated models produce different features, so they get their own name
+        self.name = model_name if num_layers is None else f"{model_name}:{num_layers}"
+        self.execution = execution or ExecutionPolicy()
+        self.model = None
+        self.tokenizer = None
+        if not lazy:
+            self.load()
+
+    def load(self):
+        """Load the model and tokenizer (once)."""
+        if self.model is not None:
+            return
+        source, local_files_only = pretrained_source(
+            self.model_name, self.bundle_root, self.allow_hub
+        )
+        config = AutoConfig.from_pretrained(source, local_files_only=local_files_only)
+        if self.num_layers is not None:
+            if not 1 <= self.num_layers <= config.n_layers:
+                raise ValueError(
+                    f"{self.model_name} has {config.n_layers} layers, "
+                    f"cannot keep {self.num_layers}."
+                )
+            # Building the model with fewer layers skips loading the others' weights
+            config.n_layers = self.num_layers
+        model = DistilBertModel.from_pretrained(
+            source,
+            config=config,
+            torch_dtype=self.execution.dtype,
+            local_files_only=local_files_only,
+        )
+        self.tokenizer = DistilBertTokenizer.from_pretrained(
+            source, local_files_only=local_files_only
+        )
+        self.model = self.freeze(model)
+
+    def run_model(self, model, input_ids, attention_mask):
+        """Return the CLS embeddings of a padded sub-batch."""
+        return model(input_ids=input_ids, attention_mask=attention_mask)[0][:, 0, :]
+
+    def identity(self):
+        """Describe the encoder, including how many layers it keeps."""
+        return {**super().identity(), "num_layers": self.num_layers}
+
+
+class HashingEncoder(TextEncoder):
+    """Signed hashing trick over word n-grams (no vocabulary, no fitting)."""
+
+    kind = "hashing"
+
+    def __init__(self, output_dim=4096, ngram_range=(1, 2)):
+        self.output_dim = output_dim
+        self.ngram_range = ngram_range
+        self.name = f"hashing-{output_dim}-{ngram_range[0]}{ngram_range[1]}"
+
+    def encode(self, texts):
+        """Return L2-normalized hashed n-gram counts."""
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for gram in word_ngrams(text, self.ngram_range):
+                digest = zlib.crc32(gram.encode())
+                rows.append(row)
+                columns.append(digest % self.output_dim)
+                # The top bit picks the sign, so collisions tend to cancel out
+                signs.append(1.0 if digest & 0x80000000 else -1.0)
+
+        features = np.zeros((len(texts), self.output_dim), dtype=np.float32)
+        np.add.at(features, (rows, columns), signs)
+        return torch.from_numpy(_l2_normalize(features))
+
+
+class TfidfEncoder(TextEncoder):
+    """TF-IDF features over the most common n-grams of a corpus."""
+
+    kind = "tfidf"
+
+    def __init__(self, documents=None, max_features=2048, ngram_range=(1, 2)):
+        if documents is None:
+            documents = story_corpus()
+        self.ngram_range = ngram_range
+
+        document_frequency = {}
+        for document in documents:
+            for gram in set(word_ngrams(document, ngram_range)):
+                document_frequency[gram] = document_frequency.get(gram, 0) + 1
+
+        # Most frequent n-grams first, ties broken alphabetically for determinism
+        vocabulary = sorted(
+            document_frequency, key=lambda g: (-document_frequency[g], g)
+        )
+        vocabulary = vocabulary[:max_features]
+        self.vocabulary = {gram: i for i, gram in enumerate(vocabulary)}
+
+        # Smoothed inverse document frequency
+        frequencies = np.array([document_frequency[g] for g in vocabulary])
+        self.idf = (np.log((1 + len(documents)) / (1 + frequencies)) + 1).astype(
+            np.float32
+        )
+        self.output_dim = len(vocabulary)
+        self.name = f"tfidf-{self.output_dim}-{ngram_range[0]}{ngram_range[1]}"
+
+    def encode(self, texts):
+        """Return L2-normalized TF-IDF vectors (out-of-vocabulary n-grams ignored)."""
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            for gram in word_ngrams(text, self.ngram_range):
+                column = self.vocabulary.get(gram)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+
+        features = np.zeros((len(texts), self.output_dim), dtype=np.float32)
+        np.add.at(features, (rows, columns), 1.0)
+        features *= self.idf
+        return torch.from_numpy(_l2_normalize(features))
+
+
+class StudentNetwork(nn.Module):
+    """Few-layer transformer mapping BERT token ids to a CLS-sized embedding."""
+
+    def __init__(
+        self,
+        vocab_size,
+        output_dim=768,
+        dim=128,
+        num_layers=2,
+        num_heads=4,
+        max_length=256,
+        pad_token_id=0,
+    ):
+        super(StudentNetwork, self).__init__()
+        self.token_embedding = nn.Embedding(vocab_size, dim, padding_idx=pad_token_id)
+        self.position_embedding = nn.Embedding(max_length, dim)
+        self.encoder = nn.TransformerEncoder(
+            nn.TransformerEncoderLayer(
+                dim, num_heads, dim_feedforward=4 * dim, batch_first=True
+            ),
+            num_layers,
+            enable_nested_tensor=False,
+        )
+        self.norm = nn.LayerNorm(dim)
+        self.projection = nn.Linear(dim, output_dim)
+
+    def forward(self, input_ids, attention_mask):
+        """Embed tokens, encode them and mean-pool the non-padding positions."""
+        positions = torch.arange(input_ids.shape[1], device=input_ids.device)
+        x = self.token_embedding(input_ids) + self.position_embedding(positions)
+        x = self.encoder(x, src_key_padding_mask=attention_mask == 0)
+
+        mask = attention_mask.unsqueeze(-1).to(x.dtype)
+        pooled = (x * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+        return self.projection(self.norm(pooled))
+
+
+class StudentEncoder(TokenEncoder):
+    """A student network distilled from BERT's CLS embeddings."""
+
+    kind = "student"
+    output_dim = 768
+
+    def __init__(self, path=DEFAULT_STUDENT, execution=None, allow_hub=False):
+        super().__init__()
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"No student encoder at '{path}'; run playground/distill.py first."
+            )
+        artifact = torch.load(path, map_location="cpu", weights_only=False)
+        self.config = artifact["config"]
+        self.teacher = artifact["teacher"]
+        self.execution = execution or ExecutionPolicy()
+
+        model = StudentNetwork(**self.config)
+        model.load_state_dict(artifact["state_dict"])
+        self.model = self.freeze(model)
+        source, local_files_only = pretrained_source(self.teacher, allow_hub=allow_hub)
+        self.tokenizer = DistilBertTokenizer.from_pretrained(
+            source, local_files_only=local_files_only
+        )
+
+        self.output_dim = self.config["output_dim"]
+        self.max_length = self.config["max_length"]
+        self.name = (
+            f"student-{self.config['num_layers']}x{self.config['dim']}-{self.teacher}"
+        )
+
+    def run_model(self, model, input_ids, attention_mask):
+        """Return the student's embeddings of a padded sub-batch."""
+        return model(input_ids, attention_mask)
+
+
+def make_encoder(
+    kind="bert",
+    execution=None,
+    model_name="distilbert-base-uncased",
+    lazy=False,
+    num_layers=None,
+):
+    """Build an encoder by kind.
+
+    Args:
+        kind: One of ENCODERS
+        execution: ExecutionPolicy for encoders that run a model
+        model_name: Hugging Face model for the BERT encoder
+        lazy: Defer loading the BERT model until the first encode()
+        num_layers: Transformer layers the BERT encoder keeps (None: all)
+
+    Returns:
+        TextEncoder instance
+    """
+    if kind == "bert":
+        return BertEncoder(model_name, execution, lazy=lazy, num_layers=num_layers)
+    if kind == "hashing":
+        return HashingEncoder()
+    if kind == "tfidf":
+        return TfidfEncoder()
+    if kind == "student":
+        return StudentEncoder(DEFAULT_STUDENT, execution)
+    raise ValueError(f"Unknown encoder '{kind}', expected one of {ENCODERS}.")
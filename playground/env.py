@@ -16,12 +16,74 @@ Key features:
 - Path choice consequences
 - Reward shaping for exploration and preparation
 - Episode termination conditions
+- Snapshot-based resets (the story JSON is parsed only once per environment)
+- snapshot()/restore() of the full step state (Snapshot) for tree search
+- Optional LRU cache of story transitions keyed on ink state and action
+- Optional numeric observation mode with interned text and choice IDs
+- Items and attributes read from the story's ink variables
+- Optional on-disk trajectory recording (see recorder.py)
 """
 
+import hashlib
+import json
+from typing import NamedTuple
 import gymnasium as gym
 from gymnasium import spaces
-from bink.story import story_from_file
+from bink.story import Story
 import numpy as np
+from cache import LRUCache
+from rewards import REWARD_MATCHER
+from interning import PAD_ID, StringInterner
+
+STORY_PATH = "story/json/story.ink.json"
+
+# Ink variables exposed in observations, in vector order
+ITEM_VARIABLES = (
+    "has_talisman",
+    "has_flashlight",
+    "has_water",
+    "has_first_aid_kit",
+    "has_snacks",
+)
+ATTRIBUTE_VARIABLES = (
+    "curiosity",
+    "social",
+    "caution",
+    "supernatural",
+    "took_beach_path",
+    "stayed_at_station",
+)
+STORY_VARIABLES = ITEM_VARIABLES + ATTRIBUTE_VARIABLES
+
+# Key of the variables section in a saved ink state, and a decoder for just it
+VARIABLES_STATE_KEY = '"variablesState":'
+JSON_DECODER = json.JSONDecoder()
+
+
+class Snapshot(NamedTuple):
+    """Everything the next step depends on, captured by snapshot()"""
+
+    ink_state: str
+    state_key: bytes  # Hash of ink_state
+    text: str
+    choices: tuple
+    variables: np.ndarray
+    episode_steps: int
+    done: bool
+
+
+def story_variable_defaults(story_json):
+    """Read the declared default of every global variable from compiled ink JSON"""
+    defaults = {}
+    value = None
+    for token in story_json["root"][-1]["global decl"]:
+        if isinstance(token, dict) and "VAR=" in token:
+            defaults[token["VAR="]] = value
+        elif isinstance(token, (bool, int, float)):
+            value = token
+        elif isinstance(token, str) and token.startswith("^"):
+            value = token[1:]
+    return defaults
 
 
 class ReinforcedShrineAdventureEnv(gym.Env):
@@ -29,69 +91,236 @@ class ReinforcedShrineAdventureEnv(gym.Env):
 
     metadata = {"render.modes": ["human"]}
 
-    def __init__(self):
+    def __init__(
+        self, transition_cache_size=16384, observation_mode="text", recorder=None
+    ):
         super().__init__()
-        self.story = story_from_file("story/json/story.ink.json")
-        self.action_space = spaces.Discrete(4)
-        self.observation_space = spaces.Dict(
-            {
-                "text": spaces.Text(max_length=2000),
-                "choices": spaces.Sequence(spaces.Text(max_length=100)),
-                "items": spaces.Box(
-                    low=np.array([0] * 5),
-                    high=np.array([1] * 5),
-                    dtype=np.float16,
-                ),
-            }
+        if observation_mode not in ("text", "ids"):
+            raise ValueError(
+                f"Observation mode '{observation_mode}' is not recognized."
+            )
+
+        with open(STORY_PATH, "r", encoding="utf-8") as file:
+            content = file.read()
+        self.story = Story(content)
+        defaults = story_variable_defaults(json.loads(content))
+        self.variable_defaults = np.array(
+            [float(defaults.get(name, 0)) for name in STORY_VARIABLES],
+            dtype=np.float32,
         )
 
-        # Only track essential items
-        self.items = {
-            "has_talisman": False,
-            "has_flashlight": False,
-            "has_water": False,
-            "has_first_aid_kit": False,
-            "has_snacks": False,
-        }
+        self.max_choices = 4
+        self.action_space = spaces.Discrete(self.max_choices)
+        self.observation_mode = observation_mode
+        items_space = spaces.Box(
+            low=np.array([0] * 5),
+            high=np.array([1] * 5),
+            dtype=np.float16,
+        )
+        attributes_space = spaces.Box(
+            low=-np.inf,
+            high=np.inf,
+            shape=(len(ATTRIBUTE_VARIABLES),),
+            dtype=np.float32,
+        )
+        if observation_mode == "ids":
+            # Fixed-size integer arrays; strings are recoverable via self.interner
+            id_high = np.iinfo(np.int64).max
+            self.observation_space = spaces.Dict(
+                {
+                    "text_id": spaces.Box(
+                        low=0, high=id_high, shape=(), dtype=np.int64
+                    ),
+                    "choice_ids": spaces.Box(
+                        low=PAD_ID,
+                        high=id_high,
+                        shape=(self.max_choices,),
+                        dtype=np.int64,
+                    ),
+                    "choice_mask": spaces.MultiBinary(self.max_choices),
+                    "items": items_space,
+                    "attributes": attributes_space,
+                }
+            )
+        else:
+            self.observation_space = spaces.Dict(
+                {
+                    "text": spaces.Text(max_length=2000),
+                    "choices": spaces.Sequence(spaces.Text(max_length=100)),
+                    "items": items_space,
+                    "attributes": attributes_space,
+                }
+            )
+
+        # Optional TrajectoryRecorder, plus the policy outputs for the next step
+        self.recorder = recorder
+        self.policy_outputs = (np.nan, np.nan)
+
+        # Every story text and choice seen so far, plus those new since the last info
+        self.interner = StringInterner()
+        self.new_strings = {}
+
+        # Ink variable values (STORY_VARIABLES order) and the views derived from them
+        self.variables = self.variable_defaults
+        self.items = {}
+        self.attributes = {}
+        # Last decoded variables section of an ink state and its variable vector
+        self.variables_section = None
 
         self.episode_steps = 0
         self.max_steps = 20
+        self.initial_snapshot = self._capture_initial_snapshot()
+
+        # The story is deterministic given its state and a choice, so transitions
+        # can be replayed from the cache without touching the interpreter
+        self.transition_cache = (
+            LRUCache(transition_cache_size) if transition_cache_size > 0 else None
+        )
+        self.ink_state = self.initial_snapshot[2]
+        self.initial_state_key = self._state_key(self.ink_state)
+        self.state_key = self.initial_state_key
+        self.story_stale = False
         self.reset()
+        # Report the intro strings with the first info the caller actually sees
+        self.new_strings = dict(self.interner.strings)
+
+    def _capture_initial_snapshot(self):
+        """Run the story intro once and capture the resulting text, choices and ink state"""
+        text = ""
+        while self.story.can_continue():
+            text += self.story.cont() + "\n"
+        choices = [choice for choice in self.story.get_current_choices()]
+
+        ink_state = self.story.save_state()
+        return text, choices, ink_state, self._read_variables(ink_state)
+
+    def _read_variables(self, ink_state: str) -> np.ndarray:
+        """Read the story variables from a saved ink state.
+
+        The state only lists variables that differ from their declared
+        defaults, so those are filled in from the story JSON. Only the
+        variables section is decoded, and not even that when it is the same
+        as last time (most choices set no variables).
+        """
+        start = ink_state.find(VARIABLES_STATE_KEY)
+        if start < 0:
+            return self._variables_from(json.loads(ink_state)["variablesState"])
+        start += len(VARIABLES_STATE_KEY)
+
+        if self.variables_section is not None:
+            section, variables = self.variables_section
+            # A complete JSON object at the same position is the same object
+            if ink_state.startswith(section, start):
+                return variables
+
+        changed, end = JSON_DECODER.raw_decode(ink_state, start)
+        variables = self._variables_from(changed)
+        self.variables_section = (ink_state[start:end], variables)
+        return variables
+
+    def _variables_from(self, changed: dict) -> np.ndarray:
+        """Build the variable vector from the changed variables of a state"""
+        variables = self.variable_defaults.copy()
+        for i, name in enumerate(STORY_VARIABLES):
+            if name in changed:
+                variables[i] = float(changed[name])
+        return variables
+
+    def _set_variables(self, variables: np.ndarray):
+        """Adopt a variable vector and refresh the item and attribute views"""
+        self.variables = variables
+        n_items = len(ITEM_VARIABLES)
+        self.items = {
+            name: bool(value) for name, value in zip(ITEM_VARIABLES, variables)
+        }
+        self.attributes = {
+            name: float(value)
+            for name, value in zip(ATTRIBUTE_VARIABLES, variables[n_items:])
+        }
+
+    @staticmethod
+    def _state_key(ink_state: str) -> bytes:
+        """Hash a saved ink state into a compact cache key"""
+        return hashlib.blake2b(ink_state.encode(), digest_size=16).digest()
+
+    def _run_story(self, action):
+        """Choose a choice on the live story and run it until the next choice point"""
+        self.story.choose_choice_index(action)
+        text = ""
+        while self.story.can_continue():
+            text += self.story.cont() + "\n"
+        choices = [choice for choice in self.story.get_current_choices()]
+
+        return text, choices
+
+    def sync_story(self):
+        """Load the tracked ink state into the story if it was deferred"""
+        if self.story_stale:
+            self.story.load_state(self.ink_state)
+            self.story_stale = False
+
+    def _transition(self, action):
+        """Advance the story by one choice, serving repeats from the cache.
+
+        Returns the resulting text, choices, story variables and terminal flag.
+        """
+        if self.transition_cache is None:
+            self.sync_story()
+            text, choices = self._run_story(action)
+            self.ink_state = self.story.save_state()
+            self.state_key = self._state_key(self.ink_state)
+            variables = self._read_variables(self.ink_state)
+            return text, choices, variables, len(choices) == 0
+
+        key = (self.state_key, action)
+        cached = self.transition_cache.get(key)
+        if cached is None:
+            self.sync_story()
+            text, choices = self._run_story(action)
+            ink_state = self.story.save_state()
+            cached = (
+                text,
+                tuple(choices),
+                self._read_variables(ink_state),
+                len(choices) == 0,
+                ink_state,
+                self._state_key(ink_state),
+            )
+            self.transition_cache.put(key, cached)
+        else:
+            self.story_stale = True
+
+        text, choices, variables, terminal, self.ink_state, self.state_key = cached
+        return text, list(choices), variables, terminal
+
+    def snapshot(self):
+        """Capture everything the next step depends on, for restoring later"""
+        return Snapshot(
+            ink_state=self.ink_state,
+            state_key=self.state_key,
+            text=self.current_text,
+            choices=tuple(self.current_choices),
+            variables=self.variables,
+            episode_steps=self.episode_steps,
+            done=self.done,
+        )
+
+    def restore(self, snapshot: Snapshot):
+        """Return to a state captured by snapshot()"""
+        self.state_key = snapshot.state_key
+        self.current_text = snapshot.text
+        self.current_choices = list(snapshot.choices)
+        self._set_variables(snapshot.variables)
+        self.episode_steps = snapshot.episode_steps
+        self.done = snapshot.done
+        if snapshot.ink_state is not self.ink_state:
+            self.ink_state = snapshot.ink_state
+            self.story_stale = True
 
     def calculate_reward(self) -> float:
         """Calculate reward based on key dialogue moments"""
-        reward = 0.0
-
-        # Positive dialogue indicators (showing engagement/interest)
-        positive_dialogues = [
-            # Summer Break Choice
-            "sounds kinda sketchy",
-            "i still don't know",
-            "if they're super powerful",
-            "just thinking about what to pack",
-            "better to be prepared,",
-        ]
-
-        # Negative dialogue indicators (showing disengagement/avoidance)
-        negative_dialogues = [
-            # Summer Break Choice
-            "can't wait to see what's in there",
-            "i'm sorry, but i really can't",
-            "safety comes first",
-            "ignore the pang of regret",
-        ]
-
-        text_lower = self.current_text.lower()
-
-        # Check for positive dialogues
-        for dialogue in positive_dialogues:
-            if dialogue in text_lower:
-                reward += 5.0
-
-        # Check for negative dialogues
-        for dialogue in negative_dialogues:
-            if dialogue in text_lower:
-                reward -= 5.0
+        # Key dialogue phrases, matched in a single pass over the text
+        reward = REWARD_MATCHER.score(self.current_text)
 
         # Add small positive reward for survival
         if not self.done:
@@ -113,69 +342,99 @@ class ReinforcedShrineAdventureEnv(gym.Env):
             and self.items["has_first_aid_kit"]
         )
 
-    def update_items(self, choice_text: str):
-        """Track only essential item acquisitions"""
-        if "Accept talisman" in choice_text:
-            self.items["has_talisman"] = True
-        elif "Pack a flashlight" in choice_text:
-            self.items["has_flashlight"] = True
-        elif "Pack water" in choice_text:
-            self.items["has_water"] = True
-        elif "Pack a first aid kit" in choice_text:
-            self.items["has_first_aid_kit"] = True
-        elif "Pack snacks" in choice_text:
-            self.items["has_snacks"] = True
+    def annotate(self, log_prob, value):
+        """Attach the policy's log-prob and value to the next recorded step"""
+        self.policy_outputs = (float(log_prob), float(value))
+
+    def _record(self, text, variables, action, reward, done):
+        """Stream a transition to the recorder, if there is one"""
+        if self.recorder is not None:
+            log_prob, value = self.policy_outputs
+            self.recorder.add(text, action, reward, variables, done, log_prob, value)
+            self.policy_outputs = (np.nan, np.nan)
 
     def step(self, action):
         self.episode_steps += 1
         truncated = self.episode_steps >= self.max_steps
+        # Recorded transitions pair the action with the state it was taken in
+        prev_text, prev_variables = self.current_text, self.variables
 
         if action >= len(self.current_choices):
-            return self._get_observation(), -1.0, True, truncated, {}
+            self._record(prev_text, prev_variables, action, -1.0, True)
+            return self._get_observation(), -1.0, True, truncated, self._get_info()
 
         # Take action and update state
-        choice_text = self.current_choices[action]
-        self.story.choose_choice_index(action)
-        self.update_items(choice_text)
-
-        # Get new text and choices
-        self.current_text = ""
-        while self.story.can_continue():
-            self.current_text += self.story.cont() + "\n"
-        self.current_choices = [choice for choice in self.story.get_current_choices()]
+        self.current_text, self.current_choices, variables, terminal = self._transition(
+            action
+        )
+        self._set_variables(variables)
 
-        self.done = len(self.current_choices) == 0 or truncated
+        self.done = terminal or truncated
         reward = self.calculate_reward()
+        self._record(prev_text, prev_variables, action, reward, self.done)
+
+        return self._get_observation(), reward, self.done, truncated, self._get_info()
 
-        return self._get_observation(), reward, self.done, truncated, {}
+    def _intern(self, text: str) -> int:
+        """Intern a string, remembering it for the next info dict if it is new"""
+        if text not in self.interner:
+            self.new_strings[self.interner.intern(text)] = text
+        return self.interner.intern(text)
 
     def _get_observation(self):
+        n_items = len(ITEM_VARIABLES)
+        items = self.variables[:n_items].astype(np.float16)
+        attributes = self.variables[n_items:].copy()
+
+        if self.observation_mode == "ids":
+            choice_ids = np.full(self.max_choices, PAD_ID, dtype=np.int64)
+            choice_mask = np.zeros(self.max_choices, dtype=np.int8)
+            for i, choice in enumerate(self.current_choices[: self.max_choices]):
+                choice_ids[i] = self._intern(choice)
+                choice_mask[i] = 1
+            return {
+                "text_id": np.array(self._intern(self.current_text), dtype=np.int64),
+                "choice_ids": choice_ids,
+                "choice_mask": choice_mask,
+                "items": items,
+                "attributes": attributes,
+            }
+
         return {
             "text": self.current_text,
             "choices": self.current_choices,
-            "items": np.array(
-                [float(v) for v in self.items.values()], dtype=np.float16
-            ),
+            "items": items,
+            "attributes": attributes,
         }
 
+    def _get_info(self):
+        """Pass strings interned since the last call on to the caller"""
+        if self.observation_mode != "ids":
+            return {}
+        info = {"interned": self.new_strings}
+        self.new_strings = {}
+        return info
+
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed, options=options)
-        self.story = story_from_file("story/json/story.ink.json")
+        text, choices, ink_state, variables = self.initial_snapshot
+        # Loading the state is deferred until the interpreter is actually needed
+        self.ink_state = ink_state
+        self.state_key = self.initial_state_key
+        self.story_stale = True
         self.done = False
-        self.current_text = ""
-        self.items = {key: False for key in self.items}
+        self.current_text = text
+        self.current_choices = list(choices)
+        self._set_variables(variables)
         self.episode_steps = 0
 
-        while self.story.can_continue():
-            self.current_text += self.story.cont() + "\n"
-        self.current_choices = [choice for choice in self.story.get_current_choices()]
-
-        return self._get_observation(), {}
+        return self._get_observation(), self._get_info()
 
     def render(self, mode="human"):
         print("\nCurrent text:")
         print(self.current_text)
         print("\nItems:", self.items)
+        print("Attributes:", self.attributes)
         print("\nAvailable choices:")
         for i, choice in enumerate(self.current_choices):
             print(f"{i}: {choice}")
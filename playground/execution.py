@@ -0,0 +1,56 @@
+"""
+Execution policy for the agent: device, precision and gradient scaling.
+
+Everything device- or precision-specific in the agent goes through an
+ExecutionPolicy, so the same code runs on CUDA, on CPU-only machines and
+in worker processes.
+
+Precisions:
+- "fp16": float16 autocast and encoder weights, with a gradient scaler (CUDA)
+- "bf16": bfloat16 autocast and encoder weights, no scaler needed
+- "fp32": no autocast, float32 encoder weights
+- "auto": fp16 on CUDA, fp32 on CPU
+"""
+
+import contextlib
+import torch
+
+PRECISIONS = ("auto", "fp16", "bf16", "fp32")
+
+_DTYPES = {"fp16": torch.float16, "bf16": torch.bfloat16, "fp32": torch.float32}
+
+
+class ExecutionPolicy:
+    """Device, autocast dtype and scaler settings shared by the agent."""
+
+    def __init__(self, device=None, precision="auto"):
+        if precision not in PRECISIONS:
+            raise ValueError(
+                f"Unknown precision '{precision}', expected one of {PRECISIONS}."
+            )
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = torch.device(device)
+
+        if precision == "auto":
+            precision = "fp16" if self.device.type == "cuda" else "fp32"
+        if precision == "fp16" and self.device.type != "cuda":
+            raise ValueError("fp16 is only supported on CUDA; use bf16 or fp32.")
+        self.precision = precision
+
+        self.dtype = _DTYPES[precision]
+        # Gradient scaling only matters for float16's narrow exponent range
+        self.use_scaler = precision == "fp16"
+
+    def autocast(self):
+        """Return the autocast context for this policy (a no-op for fp32)."""
+        if self.precision == "fp32":
+            return contextlib.nullcontext()
+        return torch.autocast(device_type=self.device.type, dtype=self.dtype)
+
+    def make_scaler(self):
+        """Return a gradient scaler, disabled unless the precision needs one."""
+        return torch.amp.GradScaler(self.device.type, enabled=self.use_scaler)  # type: ignore
+
+    def __repr__(self):
+        return f"ExecutionPolicy(device='{self.device}', precision='{self.precision}')"
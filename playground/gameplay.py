@@ -2,7 +2,7 @@
 Interactive gameplay module for running the trained agent.
 
 Provides functionality to:
-- Load trained model checkpoints
+- Load trained model checkpoints (final or periodic)
 - Run interactive gameplay sessions
 - Display game state and agent decisions
 - Track choices and statistics
@@ -15,13 +15,22 @@ The gameplay loop:
 5. Records and shows history of choices made
 
 Uses numpy arrays for efficient state tracking and statistics.
+
+The agent runs in-process by default, behind an inference server
+(python playground/gameplay.py --server localhost:6006) or as the int8
+agent saved by quantize.py (python playground/gameplay.py --int8).
 """
 
+import argparse
 import torch
 import os
 import numpy as np
-from env import ReinforcedShrineAdventureEnv
+from env import ReinforcedShrineAdventureEnv, ATTRIBUTE_VARIABLES, STORY_VARIABLES
 from agent import ShrineAgent
+from checkpoint import latest_checkpoint
+from embedding_store import EmbeddingStore, DEFAULT_STORE
+from inference_server import InferenceClient, parse_address
+from quantize import DEFAULT_QUANTIZED, load_quantized
 
 
 def clear_screen():
@@ -29,33 +38,87 @@ def clear_screen():
     os.system("cls" if os.name == "nt" else "clear")
 
 
-def load_latest_model(results_dir):
-    """Load the most recently saved model checkpoint.
+def latest_model_path(results_dir):
+    """Return the path of the most recently saved model checkpoint.
+
+    Considers both the final models saved at the end of training and the
+    periodic checkpoints in <results_dir>/checkpoints.
 
     Args:
         results_dir: Directory containing model checkpoints
 
     Returns:
-        Loaded model checkpoint dictionary
+        Path of the newest checkpoint file
 
     Raises:
         FileNotFoundError: If no checkpoint files found
     """
     # Find the latest model file
-    model_files = [f for f in os.listdir(results_dir) if f.endswith(".pth")]
-    if not model_files:
+    model_paths = [
+        os.path.join(results_dir, f)
+        for f in os.listdir(results_dir)
+        if f.endswith(".pth")
+    ]
+    periodic = latest_checkpoint(os.path.join(results_dir, "checkpoints"))
+    if periodic is not None:
+        model_paths.append(periodic)
+    if not model_paths:
         raise FileNotFoundError("No trained models found in results directory")
 
-    latest_model = max(
-        model_files, key=lambda x: os.path.getctime(os.path.join(results_dir, x))
-    )
-    model_path = os.path.join(results_dir, latest_model)
+    return max(model_paths, key=os.path.getmtime)
+
+
+def load_latest_model(results_dir):
+    """Load the most recently saved model checkpoint.
 
-    print(f"Loading model: {latest_model}")
+    Args:
+        results_dir: Directory containing model checkpoints
+
+    Returns:
+        Loaded model checkpoint dictionary
+
+    Raises:
+        FileNotFoundError: If no checkpoint files found
+    """
+    model_path = latest_model_path(results_dir)
+    print(f"Loading model: {os.path.basename(model_path)}")
     return torch.load(model_path, weights_only=False)
 
 
-def play_game():
+def load_agent(checkpoint):
+    """Build an agent with a checkpoint's encoder and load its weights.
+
+    Args:
+        checkpoint: Dictionary from load_latest_model()
+
+    Returns:
+        ShrineAgent in evaluation mode
+    """
+    # Checkpoints from before pluggable encoders all used the full BERT
+    identity = checkpoint.get("encoder", {})
+    encoder = identity.get("kind", "bert")
+    encoder_layers = identity.get("num_layers")
+
+    # Precomputed embeddings, if built, spare loading BERT at all
+    store = None
+    if encoder == "bert" and os.path.isdir(DEFAULT_STORE):
+        store = EmbeddingStore(DEFAULT_STORE)
+        if store.model_name != identity.get("name", store.model_name):
+            store = None
+
+    agent = ShrineAgent(
+        state_size=768 + len(STORY_VARIABLES),
+        action_size=4,
+        embedding_store=store,
+        encoder=encoder,
+        encoder_layers=encoder_layers,
+    )
+    agent.policy.load_state_dict(checkpoint["model_state_dict"])
+    agent.policy.eval()
+    return agent
+
+
+def play_game(server=None, int8=False):
     """Run an interactive gameplay session with the trained agent.
 
     Initializes environment and agent, loads trained model,
@@ -63,14 +126,23 @@ def play_game():
     Tracks and displays game state, choices and statistics.
 
     Uses numpy arrays for efficient state management.
+
+    Args:
+        server: "host:port" of an inference server to act through, instead
+            of loading the model in this process
+        int8: Act with the int8 agent saved by quantize.py (CPU only)
     """
     # Initialize environment and agent
     env = ReinforcedShrineAdventureEnv()
-    agent = ShrineAgent(state_size=773, action_size=4)
-
-    # Load the trained model
-    checkpoint = load_latest_model("results")
-    agent.policy.load_state_dict(checkpoint["model_state_dict"])
+    if server:
+        agent = InferenceClient(parse_address(server))
+    elif int8:
+        print(f"Loading quantized model: {DEFAULT_QUANTIZED}")
+        agent = load_quantized(DEFAULT_QUANTIZED)
+    else:
+        # Load the trained model, then build the agent with its encoder
+        checkpoint = load_latest_model("results")
+        agent = load_agent(checkpoint)
 
     # Start game
     observation, _ = env.reset()
@@ -90,6 +162,8 @@ def play_game():
         item_names = ["talisman", "flashlight", "water", "first_aid_kit", "snacks"]
         items = observation["items"]
         print("\nItems:", {name: bool(val) for name, val in zip(item_names, items)})
+        attributes = observation["attributes"]
+        print("Attributes:", dict(zip(ATTRIBUTE_VARIABLES, attributes.tolist())))
 
         print("\nChoices:")
         for i, choice in enumerate(observation["choices"]):
@@ -125,8 +199,22 @@ def play_game():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch the trained agent play.")
+    parser.add_argument(
+        "--server",
+        default=None,
+        metavar="HOST:PORT",
+        help="Act through a running inference server",
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="Act with the int8 quantized agent (see quantize.py)",
+    )
+    args = parser.parse_args()
+
     try:
-        play_game()
+        play_game(server=args.server, int8=args.int8)
     except KeyboardInterrupt:
         print("\nGame terminated by user")
     except Exception as e:
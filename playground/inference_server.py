@@ -0,0 +1,254 @@
+"""
+Dynamic-batching inference server for the trained agent.
+
+Clients (environment workers, the gameplay CLI, game sessions) send act
+requests over a local socket. The server gathers concurrent requests into
+one batch, up to a maximum batch size or until the oldest request has
+waited for the latency deadline, runs a single act_batch() forward pass
+and sends each client its own result.
+
+The module includes:
+- InferenceServer: Listener, per-connection readers and the batching thread
+- InferenceClient: Blocking act() over a connection to the server
+
+Key features:
+- One forward pass per batch instead of one per client
+- Bounded queueing delay (max_latency) for the first request of a batch
+- Batch size statistics for tuning the two limits
+- A failing request gets its error back; the other requests are still served
+
+Usage:
+    python playground/inference_server.py --port 6006
+    python playground/gameplay.py --server localhost:6006
+"""
+
+import argparse
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+import numpy as np
+from vec_env import batch_observations
+
+DEFAULT_ADDRESS = ("localhost", 6006)
+DEFAULT_AUTHKEY = b"shrine"
+
+# Observation fields the policy reads
+REQUEST_FIELDS = ("text", "choices", "items", "attributes")
+
+
+class InferenceServer:
+    """Serves act requests from many clients with batched forward passes."""
+
+    def __init__(
+        self,
+        agent,
+        address=DEFAULT_ADDRESS,
+        authkey=DEFAULT_AUTHKEY,
+        max_batch_size=32,
+        max_latency=0.005,
+        backlog=64,
+    ):
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        # Pending connections the OS queues, so a burst of workers connecting
+        # at once is not refused
+        self.listener = Listener(address, backlog=backlog, authkey=authkey)
+        self.address = self.listener.address
+        self.requests = queue.Queue()
+        self.running = threading.Event()
+        self.batches = 0
+        self.served = 0
+        self.failed = 0
+
+    def start(self):
+        """Start accepting connections and serving batches in the background."""
+        self.running.set()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        """Run until interrupted."""
+        self.start()
+        try:
+            while self.running.is_set():
+                time.sleep(1.0)
+        finally:
+            self.close()
+
+    def _accept_loop(self):
+        """Accept client connections, each read by its own thread."""
+        while self.running.is_set():
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                break
+            threading.Thread(
+                target=self._read_loop, args=(connection,), daemon=True
+            ).start()
+
+    def _read_loop(self, connection):
+        """Queue every request a client sends until it disconnects."""
+        send_lock = threading.Lock()
+        while self.running.is_set():
+            try:
+                request_id, observation = connection.recv()
+            except (EOFError, OSError):
+                break
+            self.requests.put((connection, send_lock, request_id, observation))
+        connection.close()
+
+    def _next_batch(self):
+        """Block for a request, then gather more until the size or deadline."""
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return [request for request in batch if request is not None]
+
+    def _batch_loop(self):
+        """Run one forward pass per batch and scatter the results."""
+        while self.running.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            try:
+                results = self._act(batch)
+            except Exception:
+                # Serve the requests one by one so only the failing ones fail
+                results = [self._act_or_error(request) for request in batch]
+
+            for (connection, send_lock, request_id, _), (result, error) in zip(
+                batch, results
+            ):
+                try:
+                    with send_lock:
+                        connection.send((request_id, result, error))
+                except OSError:
+                    pass  # The client went away; its reader cleans up
+
+            self.batches += 1
+            self.served += len(batch)
+
+    def _act(self, batch):
+        """Run act_batch() on a batch of requests.
+
+        Returns:
+            List of ((action, log_prob, value), None) pairs, one per request
+        """
+        observations = batch_observations([request[3] for request in batch])
+        actions, log_probs, values = self.agent.act_batch(observations)
+        results = zip(actions.tolist(), log_probs.tolist(), values.tolist())
+        return [(result, None) for result in results]
+
+    def _act_or_error(self, request):
+        """Serve a single request, returning its error message if it fails.
+
+        The error goes back to the client; the server only counts it (see stats()).
+        """
+        try:
+            return self._act([request])[0]
+        except Exception as error:
+            self.failed += 1
+            return None, repr(error)
+
+    def stats(self):
+        """Return batch, request and failure counts and the mean batch size."""
+        return {
+            "batches": self.batches,
+            "requests": self.served,
+            "mean_batch_size": self.served / self.batches if self.batches else 0.0,
+            "failed": self.failed,
+        }
+
+    def close(self):
+        """Stop serving and close the listener."""
+        self.running.clear()
+        self.requests.put(None)
+        self.listener.close()
+
+
+class InferenceClient:
+    """Connection to an InferenceServer with an act() like ShrineAgent's."""
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY):
+        self.connection = Client(address, authkey=authkey)
+        self.next_id = 0
+
+    def act(self, observation):
+        """Request an action for a single observation.
+
+        Returns:
+            Tuple of (action, log_prob, value) as Python numbers
+
+        Raises:
+            RuntimeError: If the server failed to serve the request
+        """
+        request_id = self.next_id
+        self.next_id += 1
+        request = {field: observation[field] for field in REQUEST_FIELDS}
+        request["items"] = np.asarray(request["items"])
+        request["attributes"] = np.asarray(request["attributes"])
+        self.connection.send((request_id, request))
+
+        response_id, result, error = self.connection.recv()
+        if response_id != request_id:
+            raise RuntimeError(f"Expected response {request_id}, got {response_id}.")
+        if error is not None:
+            raise RuntimeError(f"The inference server failed: {error}")
+        return result
+
+    def close(self):
+        """Close the connection."""
+        self.connection.close()
+
+
+def parse_address(text):
+    """Parse "host:port" into a Listener/Client address."""
+    host, _, port = text.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def main():
+    """Serve the latest trained model."""
+    # Imported here because gameplay imports this module for its client
+    from gameplay import load_agent, load_latest_model
+
+    parser = argparse.ArgumentParser(description="Serve the agent's policy.")
+    parser.add_argument("--port", type=int, default=DEFAULT_ADDRESS[1], help="Port")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Batch cap")
+    parser.add_argument(
+        "--max-latency-ms", type=float, default=5.0, help="Batching deadline"
+    )
+    parser.add_argument(
+        "--backlog", type=int, default=64, help="Expected concurrent clients"
+    )
+    args = parser.parse_args()
+
+    agent = load_agent(load_latest_model("results"))
+
+    server = InferenceServer(
+        agent,
+        address=("localhost", args.port),
+        max_batch_size=args.max_batch_size,
+        max_latency=args.max_latency_ms / 1000,
+        backlog=args.backlog,
+    )
+    print(f"Serving on {server.address[0]}:{server.address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStopped. {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
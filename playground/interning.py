@@ -0,0 +1,53 @@
+"""
+String interning for story text and choices.
+
+Maps every distinct string to a stable 63-bit integer ID derived from its
+content, so IDs agree across environments, subprocess workers and runs
+without any coordination. The intern table keeps the reverse mapping so
+IDs can be turned back into text (e.g. to encode a cache miss).
+"""
+
+import hashlib
+
+# Padding value for unused ID slots
+PAD_ID = -1
+
+
+def string_id(text: str) -> int:
+    """Return the content-derived ID of a string."""
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+class StringInterner:
+    """Intern table mapping strings to stable integer IDs and back."""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = {}
+
+    def intern(self, text: str) -> int:
+        """Return the ID of text, adding it to the table if it is new."""
+        try:
+            return self.ids[text]
+        except KeyError:
+            text_id = string_id(text)
+            self.ids[text] = text_id
+            self.strings[text_id] = text
+            return text_id
+
+    def lookup(self, text_id: int) -> str:
+        """Return the string for a previously interned ID."""
+        return self.strings[text_id]
+
+    def update(self, strings):
+        """Merge an {id: string} mapping produced by another interner."""
+        for text_id, text in strings.items():
+            self.ids[text] = text_id
+            self.strings[text_id] = text
+
+    def __contains__(self, text: str) -> bool:
+        return text in self.ids
+
+    def __len__(self) -> int:
+        return len(self.strings)
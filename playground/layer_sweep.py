@@ -0,0 +1,163 @@
+"""
+Sweep of BERT encoder depth against speed and training reward.
+
+For each number of kept transformer layers K (see --encoder-layers in
+train.py), measures on CPU:
+- Encoder parameters that remain in memory
+- act() latency with the embedding cache disabled (the encoder on every step)
+- Cosine similarity of the truncated CLS embeddings to the full model's
+- Mean reward and regret of a short training run (regret needs a solved
+  story tree, see story_tree.py)
+
+Key features:
+- Same seeds and training schedule for every K
+- Results saved as JSON for picking K per deployment
+
+Usage:
+    python playground/layer_sweep.py --layers 1 2 3 4 5 6 --output results/layer_sweep.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import numpy as np
+import torch
+import torch.nn.functional as F
+from agent import ShrineAgent
+from benchmark import git_commit, summarize, time_calls
+from encoders import BertEncoder
+from env import ReinforcedShrineAdventureEnv, STORY_VARIABLES
+from execution import ExecutionPolicy
+from policy_benchmark import collect_observations
+from story_tree import load_story_tree
+from train import run_episodes
+
+
+def sweep_layer(
+    num_layers, observations, reference, num_episodes=50, repeats=50, warmup=5
+):
+    """Measure one encoder depth.
+
+    Args:
+        num_layers: Transformer layers the encoder keeps
+        observations: Observations to time act() and compare embeddings on
+        reference: Full-depth CLS embeddings of the observations' texts
+        num_episodes: Training episodes for the reward measurement
+        repeats: Number of timed act() calls
+        warmup: Number of untimed act() calls
+
+    Returns:
+        Dictionary of size, latency, fidelity and reward statistics
+    """
+    torch.manual_seed(0)
+    np.random.seed(0)
+    agent = ShrineAgent(
+        state_size=768 + len(STORY_VARIABLES),
+        action_size=4,
+        batch_size=64,
+        device="cpu",
+        encoder_layers=num_layers,
+    )
+    encoder = agent.policy.encoder
+    model, _ = encoder.loaded()
+
+    # The encoder on every call
+    cycle = itertools.cycle(observations)
+    cache, agent.policy.embedding_cache = agent.policy.embedding_cache, None
+    latency = time_calls(lambda: agent.act(next(cycle)), repeats, warmup)
+    agent.policy.embedding_cache = cache
+
+    embeddings = encoder.encode([observation["text"] for observation in observations])
+    cosine = F.cosine_similarity(embeddings.float(), reference, dim=1)
+
+    env = ReinforcedShrineAdventureEnv()
+    rewards = np.array(
+        [
+            total_reward
+            for total_reward, _, _ in run_episodes(
+                env, agent, num_episodes, lambda: agent.c2
+            )
+        ]
+    )
+
+    return {
+        "encoder": encoder.identity(),
+        "encoder_parameters": sum(p.numel() for p in model.parameters()),
+        "act_uncached": summarize(latency),
+        "cls_cosine_mean": float(cosine.mean()),
+        "cls_cosine_min": float(cosine.min()),
+        "rewards": rewards.tolist(),
+    }
+
+
+def main():
+    """Run the sweep, print a summary and optionally save it."""
+    parser = argparse.ArgumentParser(description="Sweep BERT encoder depth.")
+    parser.add_argument(
+        "--layers", type=int, nargs="+", default=[1, 2, 3, 4, 5, 6], help="K values"
+    )
+    parser.add_argument("--episodes", type=int, default=50, help="Training episodes")
+    parser.add_argument("--repeats", type=int, default=50, help="Timed act() calls")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed act() calls")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    observations = [observation for observation, *_ in collect_observations(64)]
+    full = BertEncoder(execution=ExecutionPolicy("cpu", "fp32"))
+    reference = full.encode([observation["text"] for observation in observations])
+    del full
+
+    # Regret is only reported once the story tree has been solved
+    story_tree = load_story_tree()
+    optimal_return = story_tree["optimal_return"] if story_tree else None
+    window = max(1, args.episodes // 5)
+
+    results = {
+        "commit": git_commit(),
+        "threads": torch.get_num_threads(),
+        "episodes": args.episodes,
+        "optimal_return": optimal_return,
+        "layers": {},
+    }
+    print(
+        f"{'K':>2} {'params':>8} {'act ms':>8} {'cosine':>7} {'reward':>7} {'regret':>7}"
+    )
+    for num_layers in args.layers:
+        stats = sweep_layer(
+            num_layers,
+            observations,
+            reference,
+            args.episodes,
+            args.repeats,
+            args.warmup,
+        )
+        # Reward at the end of training, once the policy has had time to learn
+        final_reward = float(np.mean(stats["rewards"][-window:]))
+        stats["final_mean_reward"] = final_reward
+        if optimal_return is not None:
+            stats["final_mean_regret"] = optimal_return - final_reward
+            regret = f"{stats['final_mean_regret']:>7.2f}"
+        else:
+            stats["final_mean_regret"] = None
+            regret = f"{'-':>7}"
+        results["layers"][num_layers] = stats
+        print(
+            f"{num_layers:>2} {stats['encoder_parameters'] / 1e6:>7.1f}M "
+            f"{stats['act_uncached']['median_us'] / 1e3:>8.2f} "
+            f"{stats['cls_cosine_mean']:>7.3f} "
+            f"{final_reward:>7.2f} {regret}"
+        )
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
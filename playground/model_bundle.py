@@ -0,0 +1,246 @@
+"""
+Versioned local bundles of the pretrained encoder and its tokenizer.
+
+Exporting saves DistilBERT (as memory-mappable safetensors) and its
+tokenizer into the project, so training, gameplay and worker processes
+start without going through the Hugging Face hub or its cache. The
+encoders load from the bundle with local_files_only=True and never touch
+the network; without a bundle they fail unless the caller opts into the
+hub.
+
+The module includes:
+- export_bundle: Saves a new bundle version and makes it the latest
+- bundle_path: Finds the latest (or a given) bundle of a model
+- pretrained_source: Where an encoder should load a model from
+- verify_bundle: Checks a bundle's files against its manifest
+
+Layout:
+    models/<model name>/v1/model.safetensors, config.json, vocab.txt, ...
+    models/<model name>/v1/manifest.json    model, version and file hashes
+    models/<model name>/LATEST              name of the latest version
+
+Usage:
+    python playground/model_bundle.py export
+    python playground/model_bundle.py startup    # hub vs bundle start time
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import transformers
+
+DEFAULT_BUNDLES = "models"
+
+
+def _model_dir(model_name, root):
+    """Directory holding every bundle version of a model."""
+    return os.path.join(root, *model_name.split("/"))
+
+
+def bundle_path(model_name, root=DEFAULT_BUNDLES, version=None):
+    """Return the directory of a model's bundle, or None if there is none.
+
+    Args:
+        model_name: Hugging Face model name
+        root: Bundle root directory
+        version: Bundle version (e.g. "v2"); the latest when None
+
+    Returns:
+        Bundle directory, or None
+    """
+    model_dir = _model_dir(model_name, root)
+    if version is None:
+        try:
+            with open(os.path.join(model_dir, "LATEST"), "r", encoding="utf-8") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+    path = os.path.join(model_dir, version)
+    return path if os.path.isdir(path) else None
+
+
+def pretrained_source(model_name, root: str | None = DEFAULT_BUNDLES, allow_hub=False):
+    """Return where from_pretrained() should load a model from.
+
+    Args:
+        model_name: Hugging Face model name
+        root: Bundle root directory (None skips bundles)
+        allow_hub: Fall back to the hub when there is no bundle
+
+    Returns:
+        Tuple of (name or bundle directory, local_files_only); bundles are
+        loaded with local_files_only so nothing is fetched
+
+    Raises:
+        FileNotFoundError: If there is no bundle and allow_hub is False
+    """
+    path = bundle_path(model_name, root) if root is not None else None
+    if path is not None:
+        return path, True
+    if not allow_hub:
+        raise FileNotFoundError(
+            f"No bundle of {model_name} in '{root}'; export the bundle with "
+            f"`python playground/model_bundle.py export --model {model_name}`."
+        )
+    return model_name, False
+
+
+def _sha256(path):
+    """Hash a file in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_bundle(model_name="distilbert-base-uncased", root=DEFAULT_BUNDLES):
+    """Save a model and its tokenizer as a new bundle version.
+
+    The bundle is written to a temp directory and renamed into place
+    before LATEST is switched to it, so readers never see half a bundle.
+
+    Args:
+        model_name: Hugging Face model name (fetched once, from the hub or cache)
+        root: Bundle root directory
+
+    Returns:
+        Directory of the new bundle
+    """
+    model = transformers.DistilBertModel.from_pretrained(model_name)
+    tokenizer = transformers.DistilBertTokenizer.from_pretrained(model_name)
+
+    model_dir = _model_dir(model_name, root)
+    os.makedirs(model_dir, exist_ok=True)
+    versions = [
+        int(name[1:])
+        for name in os.listdir(model_dir)
+        if name.startswith("v") and name[1:].isdigit()
+    ]
+    version = f"v{max(versions, default=0) + 1}"
+
+    tmp_path = os.path.join(model_dir, f".{version}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    model.save_pretrained(tmp_path, safe_serialization=True)
+    tokenizer.save_pretrained(tmp_path)
+
+    manifest = {
+        "model_name": model_name,
+        "version": version,
+        "transformers": transformers.__version__,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": {
+            name: _sha256(os.path.join(tmp_path, name))
+            for name in sorted(os.listdir(tmp_path))
+        },
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    path = os.path.join(model_dir, version)
+    os.replace(tmp_path, path)
+    latest_tmp = os.path.join(model_dir, ".LATEST.tmp")
+    with open(latest_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(model_dir, "LATEST"))
+    return path
+
+
+def verify_bundle(path):
+    """Return the names of bundle files that are missing or do not match."""
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return [
+        name
+        for name, digest in manifest["files"].items()
+        if not os.path.exists(os.path.join(path, name))
+        or _sha256(os.path.join(path, name)) != digest
+    ]
+
+
+def _time_startup(model_name, source):
+    """Load the encoder in this process and print the time to first embedding."""
+    # Imported here because encoders imports this module
+    from encoders import BertEncoder
+    from execution import ExecutionPolicy
+
+    hub = source == "hub"
+    encoder = BertEncoder(
+        model_name,
+        ExecutionPolicy("cpu", "fp32"),
+        lazy=True,
+        bundle_root=None if hub else DEFAULT_BUNDLES,
+        allow_hub=hub,
+    )
+
+    start = time.perf_counter()
+    encoder.load()
+    loaded = time.perf_counter()
+    encoder.encode(["You stand before the shrine."])
+    print(
+        json.dumps(
+            {
+                "load_seconds": loaded - start,
+                "first_encode_seconds": time.perf_counter() - start,
+            }
+        )
+    )
+
+
+def measure_startup(model_name, repeats=3):
+    """Time encoder start-up from the hub and from the bundle in fresh processes.
+
+    Returns:
+        Dictionary of source -> list of timing dictionaries
+    """
+    results = {}
+    for source in ("hub", "bundle"):
+        results[source] = []
+        for _ in range(repeats):
+            output = subprocess.run(
+                [sys.executable, __file__, "_time", source, "--model", model_name],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results[source].append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    """Export, verify or time model bundles."""
+    parser = argparse.ArgumentParser(description="Manage local model bundles.")
+    parser.add_argument("command", choices=("export", "verify", "startup", "_time"))
+    parser.add_argument("source", nargs="?", help=argparse.SUPPRESS)
+    parser.add_argument("--model", default="distilbert-base-uncased", help="Model")
+    parser.add_argument("--repeats", type=int, default=3, help="Startup runs")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        start = time.perf_counter()
+        path = export_bundle(args.model)
+        print(f"Exported {args.model} to {path} in {time.perf_counter() - start:.1f}s")
+    elif args.command == "verify":
+        path = bundle_path(args.model)
+        if path is None:
+            sys.exit(f"No bundle of {args.model}")
+        mismatched = verify_bundle(path)
+        print(f"{path}: " + (f"mismatched {mismatched}" if mismatched else "OK"))
+        sys.exit(1 if mismatched else 0)
+    elif args.command == "startup":
+        results = measure_startup(args.model, args.repeats)
+        for source, runs in results.items():
+            load = min(run["load_seconds"] for run in runs)
+            first = min(run["first_encode_seconds"] for run in runs)
+            print(f"{source}: load {load:.2f}s, first embedding {first:.2f}s")
+    else:
+        _time_startup(args.model, args.source)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+CPU benchmark for the agent under each execution precision.
+
+Measures, for every precision the CPU supports (fp32 and bf16):
+- act() latency with the embedding cache disabled (BERT on every call)
+- act() latency with a warm embedding cache (heads only)
+- update() time for one batch of transitions
+
+Key features:
+- Warmup iterations before timing (see benchmark.time_calls)
+- Transitions come from real environment episodes
+- Results saved as JSON for comparing commits
+
+Usage:
+    python playground/policy_benchmark.py --output results/policy_benchmark.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+import numpy as np
+import torch
+from agent import ShrineAgent
+from benchmark import git_commit, random_policy, summarize, time_calls
+from env import ReinforcedShrineAdventureEnv, STORY_VARIABLES
+
+CPU_PRECISIONS = ("fp32", "bf16")
+
+
+def collect_observations(num_steps, seed=0):
+    """Collect (observation, action, reward, done) tuples with a random policy."""
+    env = ReinforcedShrineAdventureEnv()
+    policy = random_policy(seed)
+    observation, _ = env.reset()
+    transitions = []
+    for _ in range(num_steps):
+        action = policy(observation)
+        next_observation, reward, done, truncated, _ = env.step(action)
+        transitions.append((observation, action, reward, done or truncated))
+        observation = next_observation
+        if done or truncated:
+            observation, _ = env.reset()
+    return transitions
+
+
+def benchmark_precision(precision, transitions, repeats=50, warmup=5, updates=3):
+    """Time act() and update() on CPU for one precision.
+
+    Args:
+        precision: Execution precision (see execution.PRECISIONS)
+        transitions: Transitions from collect_observations()
+        repeats: Number of timed act() calls per configuration
+        warmup: Number of untimed act() calls per configuration
+        updates: Number of timed update() calls
+
+    Returns:
+        Dictionary of latency statistics
+    """
+    torch.manual_seed(0)
+    agent = ShrineAgent(
+        state_size=768 + len(STORY_VARIABLES),
+        action_size=4,
+        batch_size=len(transitions),
+        device="cpu",
+        precision=precision,
+    )
+    observations = [observation for observation, *_ in transitions]
+    cycle = itertools.cycle(observations)
+
+    def act_cycle():
+        """Act on the next observation in turn."""
+        agent.act(next(cycle))
+
+    # BERT on every call
+    cache, agent.policy.embedding_cache = agent.policy.embedding_cache, None
+    uncached = time_calls(act_cycle, repeats, warmup)
+
+    # Heads only, once every text has been seen
+    agent.policy.embedding_cache = cache
+    for observation in observations:
+        agent.act(observation)
+    cached = time_calls(act_cycle, repeats, warmup)
+
+    update_times = np.empty(updates, dtype=np.float64)
+    for i in range(updates):
+        for observation, action, reward, done in transitions:
+            _, log_prob, value = agent.act(observation)
+            agent.memory.add(observation, action, reward, done, log_prob, value)
+        start = time.perf_counter()
+        agent.update()
+        update_times[i] = time.perf_counter() - start
+
+    return {
+        "act_uncached": summarize(uncached),
+        "act_cached": summarize(cached),
+        "update_mean_s": float(np.mean(update_times)),
+        "update_transitions": len(transitions),
+    }
+
+
+def main():
+    """Run the CPU policy benchmark, print a summary and optionally save it."""
+    parser = argparse.ArgumentParser(description="Benchmark the agent on CPU.")
+    parser.add_argument("--repeats", type=int, default=50, help="Timed act() calls")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed act() calls")
+    parser.add_argument("--batch", type=int, default=64, help="Update batch size")
+    parser.add_argument("--threads", type=int, default=None, help="Torch threads")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    transitions = collect_observations(args.batch)
+
+    results = {
+        "commit": git_commit(),
+        "threads": torch.get_num_threads(),
+        "precisions": {},
+    }
+    for precision in CPU_PRECISIONS:
+        stats = benchmark_precision(precision, transitions, args.repeats, args.warmup)
+        results["precisions"][precision] = stats
+        print(f"{precision}:")
+        print(f"  act (BERT):   {stats['act_uncached']['median_us'] / 1e3:.1f} ms")
+        print(f"  act (cached): {stats['act_cached']['median_us'] / 1e3:.2f} ms")
+        print(
+            f"  update:       {stats['update_mean_s']:.2f} s "
+            f"({stats['update_transitions']} transitions)"
+        )
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Int8 dynamic quantization of the agent for inference-only CPU use.
+
+Dynamic quantization stores nn.Linear weights as int8 and quantizes
+activations on the fly, which shrinks DistilBERT about 4x and speeds up
+its matrix multiplications on CPU. Nothing here can be trained further;
+the quantized agent only acts.
+
+The module includes:
+- quantize_policy: Quantizes the encoder model and the actor-critic heads
+- save_quantized / load_quantized: A self-contained quantized artifact
+- parity_check: Compares action distributions with the float model
+- measure: Latency and peak RSS of a float or int8 agent, in a subprocess
+
+Key features:
+- Loading the artifact never allocates float BERT linear weights
+- Parity measured on observations from the story itself
+- Each RSS figure comes from a fresh process, so they do not mix
+
+Usage:
+    python playground/quantize.py            # quantize the latest checkpoint
+    python playground/gameplay.py --int8     # play with the quantized agent
+"""
+
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import torch
+import torch.nn as nn
+from torch.ao.nn.quantized.dynamic import Linear as QuantizedLinear
+from torch.ao.quantization import quantize_dynamic
+from transformers import DistilBertConfig, DistilBertModel, DistilBertTokenizer
+from agent import ShrineAgent
+from benchmark import summarize, time_calls
+from encoders import BertEncoder, make_encoder
+from env import STORY_VARIABLES
+from execution import ExecutionPolicy
+from model_bundle import pretrained_source
+from vec_env import batch_observations
+
+DEFAULT_QUANTIZED = "results/shrine_agent_int8.pt"
+
+HEADS = ("feature_combiner", "actor", "critic")
+
+
+def _quantize(module):
+    """Return a copy of a module with int8 dynamic nn.Linear layers."""
+    return quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+
+
+def _swap_linear(module):
+    """Replace every nn.Linear below a module with an empty int8 one."""
+    for name, child in module.named_children():
+        if isinstance(child, nn.Linear):
+            quantized = QuantizedLinear(
+                child.in_features,
+                child.out_features,
+                bias_=child.bias is not None,
+                dtype=torch.qint8,
+            )
+            setattr(module, name, quantized)
+        else:
+            _swap_linear(child)
+
+
+def empty_quantized_bert(config):
+    """Build a quantized DistilBERT skeleton without allocating float weights.
+
+    The model is built on the meta device, its linear layers are swapped
+    for int8 ones and the remaining (embedding, norm) tensors are then
+    allocated, uninitialised. load_state_dict() fills in the weights.
+    """
+    config = DistilBertConfig.from_dict(config)
+    with torch.device("meta"):
+        model = DistilBertModel(config)
+    _swap_linear(model)
+    model = model.to_empty(device="cpu")
+    # The embeddings hold a non-persistent position id buffer, which is not
+    # in the state dict, so they are built for real
+    model.embeddings = type(model.embeddings)(config)
+    return model.eval()
+
+
+def quantize_policy(policy):
+    """Quantize an ActorCritic in place for CPU inference.
+
+    The BERT encoder's model and every head are quantized. Lexical
+    encoders have nothing to quantize, and the distilled student is
+    already small, so those encoders are left as they are.
+
+    Args:
+        policy: Float32 ActorCritic on the CPU
+
+    Returns:
+        The same policy, in evaluation mode
+    """
+    policy.eval()
+    for name in HEADS:
+        setattr(policy, name, _quantize(getattr(policy, name)))
+    if isinstance(policy.encoder, BertEncoder):
+        policy.encoder.load()
+        policy.encoder.model = _quantize(policy.encoder.model)
+    return policy
+
+
+def _cpu_agent(encoder):
+    """Build a float32 CPU agent around an encoder, for acting only."""
+    return ShrineAgent(
+        state_size=768 + len(STORY_VARIABLES),
+        action_size=4,
+        device="cpu",
+        precision="fp32",
+        encoder=encoder,
+    )
+
+
+def agent_from_checkpoint(checkpoint):
+    """Build a float32 CPU agent from a training checkpoint."""
+    identity = checkpoint.get("encoder", {})
+    encoder = make_encoder(
+        identity.get("kind", "bert"),
+        ExecutionPolicy("cpu", "fp32"),
+        num_layers=identity.get("num_layers"),
+    )
+    agent = _cpu_agent(encoder)
+    agent.policy.load_state_dict(checkpoint["model_state_dict"])
+    agent.policy.eval()
+    return agent
+
+
+def save_quantized(agent, path=DEFAULT_QUANTIZED):
+    """Save a quantized agent's weights and what is needed to rebuild it."""
+    encoder = agent.policy.encoder
+    artifact = {
+        "encoder": encoder.identity(),
+        "policy_state_dict": agent.policy.state_dict(),
+        "encoder_config": None,
+        "encoder_state_dict": None,
+    }
+    if isinstance(encoder, BertEncoder):
+        model, _ = encoder.loaded()
+        assert isinstance(model, DistilBertModel)
+        artifact["encoder_config"] = model.config.to_dict()
+        artifact["encoder_state_dict"] = model.state_dict()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    torch.save(artifact, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def load_quantized(path=DEFAULT_QUANTIZED):
+    """Load a quantized agent saved by save_quantized().
+
+    The BERT encoder is rebuilt from its saved config as an int8 skeleton
+    and filled with the saved weights, so its float linear weights are
+    never allocated.
+
+    Returns:
+        ShrineAgent that acts with the quantized policy (CPU only)
+    """
+    artifact = torch.load(path, map_location="cpu", weights_only=False)
+    identity = artifact["encoder"]
+    execution = ExecutionPolicy("cpu", "fp32")
+
+    if identity["kind"] == "bert":
+        model_name = identity["name"].split(":")[0]
+        encoder = BertEncoder(
+            model_name, execution, lazy=True, num_layers=identity.get("num_layers")
+        )
+        encoder.model = empty_quantized_bert(artifact["encoder_config"])
+        encoder.model.load_state_dict(artifact["encoder_state_dict"])
+        source, local_files_only = pretrained_source(model_name)
+        encoder.tokenizer = DistilBertTokenizer.from_pretrained(
+            source, local_files_only=local_files_only
+        )
+    else:
+        encoder = make_encoder(identity["kind"], execution)
+
+    agent = _cpu_agent(encoder)
+    for name in HEADS:
+        setattr(agent.policy, name, _quantize(getattr(agent.policy, name)))
+    agent.policy.load_state_dict(artifact["policy_state_dict"])
+    agent.policy.eval()
+    return agent
+
+
+def parity_check(reference, quantized, observations, batch_size=32):
+    """Compare the action distributions of a float and a quantized agent.
+
+    Args:
+        reference: Float agent
+        quantized: Quantized agent with the same weights
+        observations: Observations to compare on
+        batch_size: Observations per forward pass
+
+    Returns:
+        Dictionary with mean/max total variation distance, mean KL
+        divergence and how often the most likely action agrees
+    """
+    tv, kl, agree = [], [], []
+    for start in range(0, len(observations), batch_size):
+        batch = observations[start : start + batch_size]
+        batch = batch_observations(batch)
+        p = reference.action_distribution(batch)[0].probs
+        q = quantized.action_distribution(batch)[0].probs
+        tv.append(0.5 * (p - q).abs().sum(dim=-1))
+        kl.append((p * (p.clamp_min(1e-12) / q.clamp_min(1e-12)).log()).sum(dim=-1))
+        agree.append(p.argmax(dim=-1) == q.argmax(dim=-1))
+    tv, kl, agree = torch.cat(tv), torch.cat(kl), torch.cat(agree)
+    return {
+        "observations": len(observations),
+        "mean_tv": float(tv.mean()),
+        "max_tv": float(tv.max()),
+        "mean_kl": float(kl.mean()),
+        "argmax_agreement": float(agree.float().mean()),
+    }
+
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MiB.
+
+    Reads VmHWM on Linux, because ru_maxrss carries over the peak of the
+    process that spawned this one.
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(mode, checkpoint_path, quantized_path, observations, repeats=50):
+    """Load an agent in one mode and time act() with the cache disabled.
+
+    Args:
+        mode: "fp32" (from the training checkpoint) or "int8" (the artifact)
+        checkpoint_path: Training checkpoint for the fp32 agent
+        quantized_path: Quantized artifact for the int8 agent
+        observations: Observations to act on
+        repeats: Number of timed act() calls
+
+    Returns:
+        Dictionary of act() latency statistics and peak RSS in MiB
+    """
+    if mode == "int8":
+        agent = load_quantized(quantized_path)
+    else:
+        checkpoint = torch.load(checkpoint_path, weights_only=False)
+        agent = agent_from_checkpoint(checkpoint)
+    agent.policy.embedding_cache = None
+
+    cycle = itertools.cycle(observations)
+    latency = time_calls(lambda: agent.act(next(cycle)), repeats, warmup=5)
+    return {
+        "act_uncached": summarize(latency),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure_in_subprocess(mode, checkpoint_path, quantized_path, num_steps, repeats):
+    """Run measure() in a fresh interpreter so its RSS is its own."""
+    output = subprocess.run(
+        [
+            sys.executable,
+            __file__,
+            "--measure",
+            mode,
+            "--checkpoint",
+            checkpoint_path,
+            "--output",
+            quantized_path,
+            "--steps",
+            str(num_steps),
+            "--repeats",
+            str(repeats),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """Quantize the latest checkpoint, check parity and compare resources."""
+    # Imported here because gameplay imports this module for --int8
+    from gameplay import latest_model_path
+    from policy_benchmark import collect_observations
+
+    parser = argparse.ArgumentParser(description="Quantize the agent to int8.")
+    parser.add_argument("--checkpoint", default=None, help="Training checkpoint")
+    parser.add_argument("--output", default=DEFAULT_QUANTIZED, help="Int8 artifact")
+    parser.add_argument("--steps", type=int, default=512, help="Parity observations")
+    parser.add_argument("--repeats", type=int, default=50, help="Timed act() calls")
+    parser.add_argument("--measure", choices=("fp32", "int8"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or latest_model_path("results")
+    observations = [observation for observation, *_ in collect_observations(args.steps)]
+
+    if args.measure:
+        stats = measure(
+            args.measure, checkpoint_path, args.output, observations, args.repeats
+        )
+        print(json.dumps(stats))
+        return
+
+    print(f"Quantizing {checkpoint_path}")
+    checkpoint = torch.load(checkpoint_path, weights_only=False)
+    reference = agent_from_checkpoint(checkpoint)
+    quantized = agent_from_checkpoint(checkpoint)
+    quantize_policy(quantized.policy)
+    save_quantized(quantized, args.output)
+    print(f"Saved {args.output} ({os.path.getsize(args.output) / 2**20:.1f} MiB)")
+
+    # Parity of the reloaded artifact, so saving and loading are covered too
+    parity = parity_check(reference, load_quantized(args.output), observations)
+    print(
+        f"Parity over {parity['observations']} observations: "
+        f"mean TV {parity['mean_tv']:.4f}, max TV {parity['max_tv']:.4f}, "
+        f"mean KL {parity['mean_kl']:.5f}, "
+        f"argmax agreement {parity['argmax_agreement']:.1%}"
+    )
+    del reference, quantized
+
+    for mode in ("fp32", "int8"):
+        stats = measure_in_subprocess(
+            mode, checkpoint_path, args.output, args.steps, args.repeats
+        )
+        print(
+            f"{mode}: act {stats['act_uncached']['median_us'] / 1e3:.1f} ms, "
+            f"peak RSS {stats['peak_rss_mb']:.0f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
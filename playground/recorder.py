@@ -0,0 +1,194 @@
+"""
+Compact on-disk storage for environment trajectories.
+
+Transitions are streamed into fixed-size shards. Each shard is a directory
+holding one .npy file per field, so readers can memory-map any field
+without loading the rest. Story text is stored as interned IDs, with the
+ID -> text tables written alongside each shard.
+
+The module includes:
+- TrajectoryRecorder: Buffers transitions and writes full shards to disk
+- TrajectoryReader: Memory-maps recorded shards for replay and analysis
+
+Layout:
+    <directory>/shard_000000/{text_id,action,reward,variables,done,log_prob,value}.npy
+    <directory>/shard_000000/strings.json
+
+Key features:
+- Preallocated shard buffers (no per-step Python object churn)
+- Shards appear atomically (written to a temp directory, then renamed)
+- Zero-copy, memory-mapped reads
+"""
+
+import json
+import os
+import numpy as np
+from interning import StringInterner
+from env import STORY_VARIABLES
+
+SHARD_FIELDS = {
+    "text_id": (np.int64, ()),
+    "action": (np.int8, ()),
+    "reward": (np.float32, ()),
+    # Items followed by attributes, in STORY_VARIABLES order
+    "variables": (np.float32, (len(STORY_VARIABLES),)),
+    "done": (np.bool_, ()),
+    "log_prob": (np.float32, ()),
+    "value": (np.float32, ()),
+}
+
+
+class TrajectoryRecorder:
+    """Streams transitions into chunked .npy shards."""
+
+    def __init__(self, directory, shard_size=65536):
+        self.directory = directory
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+
+        self.buffers = {
+            name: np.empty((shard_size, *shape), dtype=dtype)
+            for name, (dtype, shape) in SHARD_FIELDS.items()
+        }
+        self.size = 0
+        self.shard_index = len(_shard_directories(directory))
+        self.interner = StringInterner()
+        self.new_strings = {}
+
+    def add(self, text, action, reward, variables, done, log_prob=np.nan, value=np.nan):
+        """Record a single transition.
+
+        Args:
+            text: Observation text the action was taken in
+            action: Chosen action
+            reward: Reward received
+            variables: Story variable vector (items, then attributes)
+            done: Whether the episode ended (terminated or truncated)
+            log_prob: Log-probability of the action under the behaviour policy
+            value: Critic value estimate of the observation
+        """
+        if text not in self.interner:
+            self.new_strings[self.interner.intern(text)] = text
+
+        i = self.size
+        self.buffers["text_id"][i] = self.interner.intern(text)
+        self.buffers["action"][i] = action
+        self.buffers["reward"][i] = reward
+        self.buffers["variables"][i] = variables
+        self.buffers["done"][i] = done
+        self.buffers["log_prob"][i] = log_prob
+        self.buffers["value"][i] = value
+        self.size += 1
+
+        if self.size == self.shard_size:
+            self.flush()
+
+    def add_trajectory(self, trajectory):
+        """Record every transition of a rollout worker trajectory."""
+        variables = np.concatenate(
+            [trajectory["items"], trajectory["attributes"]], axis=1
+        )
+        for i, text in enumerate(trajectory["texts"]):
+            self.add(
+                text,
+                trajectory["actions"][i],
+                trajectory["rewards"][i],
+                variables[i],
+                trajectory["dones"][i],
+                trajectory["log_probs"][i],
+                trajectory["values"][i],
+            )
+
+    def flush(self):
+        """Write the buffered transitions as a new shard."""
+        if self.size == 0:
+            return
+
+        name = f"shard_{self.shard_index:06d}"
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        os.makedirs(tmp_path, exist_ok=True)
+        for field, buffer in self.buffers.items():
+            np.save(os.path.join(tmp_path, f"{field}.npy"), buffer[: self.size])
+        with open(os.path.join(tmp_path, "strings.json"), "w", encoding="utf-8") as f:
+            json.dump({str(k): v for k, v in self.new_strings.items()}, f)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+        self.shard_index += 1
+        self.size = 0
+        self.new_strings = {}
+
+    def close(self):
+        """Flush any remaining transitions."""
+        self.flush()
+
+
+def _shard_directories(directory):
+    """Return the finished shard directories in write order."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith("shard_")
+    )
+
+
+class TrajectoryReader:
+    """Memory-mapped access to recorded trajectory shards."""
+
+    def __init__(self, directory):
+        self.shards = [
+            {
+                field: np.load(os.path.join(path, f"{field}.npy"), mmap_mode="r")
+                for field in SHARD_FIELDS
+            }
+            for path in _shard_directories(directory)
+        ]
+
+        # Strings of later shards only list what earlier shards had not
+        self.strings = {}
+        for path in _shard_directories(directory):
+            with open(os.path.join(path, "strings.json"), "r", encoding="utf-8") as f:
+                self.strings.update({int(k): v for k, v in json.load(f).items()})
+
+    def __len__(self):
+        return sum(len(shard["action"]) for shard in self.shards)
+
+    def field(self, name):
+        """Return one field across all shards (copies when there are several)."""
+        arrays = [shard[name] for shard in self.shards]
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.concatenate(arrays)
+
+    def text(self, text_id):
+        """Return the observation text for an interned ID."""
+        return self.strings[int(text_id)]
+
+    def episodes(self):
+        """Yield each recorded episode as a dictionary of field arrays.
+
+        Episodes inside a shard are zero-copy slices; an episode that spans
+        a shard boundary is stitched together (copied).
+        """
+        carry = None
+        for shard in self.shards:
+            start = 0
+            for end in np.flatnonzero(shard["done"]) + 1:
+                episode = {name: array[start:end] for name, array in shard.items()}
+                if carry is not None:
+                    episode = {
+                        name: np.concatenate([carry[name], episode[name]])
+                        for name in episode
+                    }
+                    carry = None
+                yield episode
+                start = end
+
+            if start < len(shard["done"]):
+                tail = {name: array[start:] for name, array in shard.items()}
+                if carry is not None:
+                    tail = {
+                        name: np.concatenate([carry[name], tail[name]]) for name in tail
+                    }
+                carry = tail
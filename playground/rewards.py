@@ -0,0 +1,122 @@
+"""
+Dialogue reward table and the compiled matcher that scores story text.
+
+The reward phrases are declared once in REWARD_PHRASES and compiled into
+a PhraseMatcher when the module is imported. Every phrase found in a
+(lowercased) text contributes its weight once, no matter how often it
+occurs.
+
+The matcher includes:
+- An Aho-Corasick automaton that finds every phrase in a single pass
+- Plain substring checks for small tables, where CPython's C-level
+  search beats a Python-level automaton
+- Batch scoring for several texts in one call
+"""
+
+from collections import deque
+import numpy as np
+
+# Phrase -> reward. Positive phrases show engagement/interest, negative ones
+# show disengagement/avoidance.
+REWARD_PHRASES = {
+    # Summer Break Choice (positive)
+    "sounds kinda sketchy": 5.0,
+    "i still don't know": 5.0,
+    "if they're super powerful": 5.0,
+    "just thinking about what to pack": 5.0,
+    "better to be prepared,": 5.0,
+    # Summer Break Choice (negative)
+    "can't wait to see what's in there": -5.0,
+    "i'm sorry, but i really can't": -5.0,
+    "safety comes first": -5.0,
+    "ignore the pang of regret": -5.0,
+}
+
+# Tables smaller than this are scanned with one substring check per phrase
+AUTOMATON_MIN_PHRASES = 128
+
+
+class PhraseMatcher:
+    """Scores texts against a weighted phrase table.
+
+    Tables of at least automaton_min_phrases phrases are compiled into an
+    Aho-Corasick automaton that finds every phrase in one pass per text;
+    smaller ones (like REWARD_PHRASES) run one substring check per phrase.
+    Both find the same phrases.
+    """
+
+    def __init__(self, phrases, automaton_min_phrases=AUTOMATON_MIN_PHRASES):
+        self.phrases = [phrase.lower() for phrase in phrases]
+        self.weights = [float(weight) for weight in phrases.values()]
+        self.use_automaton = len(self.phrases) >= automaton_min_phrases
+        if self.use_automaton:
+            self.transitions, self.outputs = self._build_automaton(self.phrases)
+
+    @staticmethod
+    def _build_automaton(phrases):
+        """Compile the phrases into an Aho-Corasick automaton.
+
+        Failure links are folded into the transition tables, so scanning
+        needs a single dictionary lookup per character.
+
+        Returns:
+            Tuple of (per-state transition dicts, per-state matched phrase ids)
+        """
+        transitions = [{}]
+        outputs: list[tuple[int, ...]] = [()]
+        for index, phrase in enumerate(phrases):
+            state = 0
+            for char in phrase:
+                if char not in transitions[state]:
+                    transitions.append({})
+                    outputs.append(())
+                    transitions[state][char] = len(transitions) - 1
+                state = transitions[state][char]
+            outputs[state] += (index,)
+
+        # Breadth-first pass: inherit the failure state's transitions and outputs
+        fail = [0] * len(transitions)
+        queue = deque(transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] += outputs[fail[state]]
+            for char, target in list(transitions[state].items()):
+                queue.append(target)
+                fail[target] = transitions[fail[state]].get(char, 0) if state else 0
+            for char, target in transitions[fail[state]].items():
+                transitions[state].setdefault(char, target)
+
+        return transitions, outputs
+
+    def match(self, text):
+        """Return the ids of every phrase present in text."""
+        text = text.lower()
+        if not self.use_automaton:
+            return {i for i, phrase in enumerate(self.phrases) if phrase in text}
+
+        transitions, outputs = self.transitions, self.outputs
+        found = set()
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+    def score(self, text):
+        """Sum the weights of the phrases present in text."""
+        return sum((self.weights[i] for i in self.match(text)), 0.0)
+
+    def score_batch(self, texts):
+        """Score several texts in one call.
+
+        Args:
+            texts: Sequence of strings
+
+        Returns:
+            Array of scores, one per text
+        """
+        return np.array([self.score(text) for text in texts], dtype=np.float64)
+
+
+REWARD_MATCHER = PhraseMatcher(REWARD_PHRASES)
@@ -0,0 +1,240 @@
+"""
+Process-pool rollout collection for the PPO agent.
+
+Spreads episode collection across worker processes so that ink stepping
+and BERT inference run while the learner performs its PPO updates.
+
+The module includes:
+- RolloutWorkerPool: Owns the worker processes and the shared head weights
+- load_trajectory: Feeds a worker trajectory into an agent's RolloutBuffer
+
+Each worker:
+1. Owns its own environment and a CPU copy of the policy
+2. Loads the latest shared head weights at the start of every collection
+3. Runs act() until it has collected enough whole episodes
+4. Sends back a compact trajectory of numpy arrays
+
+Key features:
+- Head weights live in shared memory; broadcasting is an in-place copy
+- Frozen DistilBERT weights are never sent between processes
+- Collection of the next batch overlaps with the learner's update
+"""
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from env import ReinforcedShrineAdventureEnv, STORY_VARIABLES
+from agent import ShrineAgent, trainable_state_dict
+from embedding_store import EmbeddingStore
+
+
+def collect_episodes(env, agent, num_steps):
+    """Run whole episodes until at least num_steps transitions were collected.
+
+    Args:
+        env: Environment to step
+        agent: Agent whose act() picks the actions
+        num_steps: Minimum number of transitions to collect
+
+    Returns:
+        Trajectory dictionary of numpy arrays plus per-episode summaries
+    """
+    texts, items, attributes, num_choices = [], [], [], []
+    actions, rewards, dones, log_probs, values = [], [], [], [], []
+    episodes = []
+
+    while len(actions) < num_steps:
+        observation, _ = env.reset()
+        total_reward = 0.0
+        episode_choices = []
+        done = truncated = False
+
+        while not done and not truncated:
+            action, log_prob, value = agent.act(observation)
+            next_observation, reward, done, truncated, _ = env.step(action)
+
+            if action < len(observation["choices"]):
+                episode_choices.append(observation["choices"][action])
+
+            texts.append(observation["text"])
+            items.append(observation["items"])
+            attributes.append(observation["attributes"])
+            num_choices.append(len(observation["choices"]))
+            actions.append(action)
+            rewards.append(reward)
+            dones.append(done or truncated)
+            log_probs.append(log_prob.item())
+            values.append(value.item())
+
+            total_reward += reward
+            observation = next_observation
+
+        episodes.append(
+            {
+                "total_reward": total_reward,
+                "choices": episode_choices,
+                "items": observation["items"],
+            }
+        )
+
+    return {
+        "texts": texts,
+        "items": np.stack(items),
+        "attributes": np.stack(attributes),
+        "actions": np.array(actions, dtype=np.int64),
+        "num_choices": np.array(num_choices, dtype=np.int64),
+        "rewards": np.array(rewards, dtype=np.float32),
+        "dones": np.array(dones, dtype=np.bool_),
+        "log_probs": np.array(log_probs, dtype=np.float32),
+        "values": np.array(values, dtype=np.float32),
+        "episodes": episodes,
+    }
+
+
+def load_trajectory(agent, trajectory):
+    """Append a worker trajectory to the agent's rollout buffer.
+
+    Args:
+        agent: Learner agent whose memory receives the transitions
+        trajectory: Dictionary produced by collect_episodes
+    """
+    agent.memory.extend(
+        trajectory["texts"],
+        np.concatenate([trajectory["items"], trajectory["attributes"]], axis=1),
+        trajectory["actions"],
+        trajectory["num_choices"],
+        trajectory["rewards"],
+        trajectory["dones"],
+        trajectory["log_probs"],
+        trajectory["values"],
+    )
+
+
+def _rollout_worker(
+    remote,
+    parent_remote,
+    shared_weights,
+    lock,
+    seed,
+    num_threads,
+    embedding_store,
+    precision,
+    encoder,
+    encoder_layers,
+):
+    """Collect trajectories with a CPU copy of the policy in a subprocess."""
+    parent_remote.close()
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+    torch.set_num_threads(num_threads)
+
+    env = ReinforcedShrineAdventureEnv()
+    agent = ShrineAgent(
+        state_size=768 + len(STORY_VARIABLES),
+        action_size=4,
+        device="cpu",
+        embedding_store=EmbeddingStore(embedding_store) if embedding_store else None,
+        precision=precision,
+        encoder=encoder,
+        encoder_layers=encoder_layers,
+    )
+
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == "collect":
+                with lock:
+                    agent.policy.load_state_dict(shared_weights, strict=False)
+                remote.send(collect_episodes(env, agent, data))
+            elif command == "close":
+                break
+            else:
+                raise ValueError(f"Unknown worker command '{command}'.")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remote.close()
+
+
+class RolloutWorkerPool:
+    """Pool of processes collecting rollouts with shared policy weights."""
+
+    def __init__(
+        self,
+        policy,
+        num_workers,
+        steps_per_worker,
+        threads_per_worker=1,
+        embedding_store=None,
+        precision="auto",
+        encoder="bert",
+        encoder_layers=None,
+    ):
+        self.num_workers = num_workers
+        self.steps_per_worker = steps_per_worker
+        self.pending = False
+
+        # CPU copy of the head weights, shared with every worker
+        self.shared_weights = {
+            key: value.detach().to("cpu", copy=True).share_memory_()
+            for key, value in trainable_state_dict(policy).items()
+        }
+        self.lock = mp.Lock()
+
+        self.remotes, work_remotes = zip(*[mp.Pipe() for _ in range(num_workers)])
+        self.processes = []
+        for worker_id, (remote, work_remote) in enumerate(
+            zip(self.remotes, work_remotes)
+        ):
+            process = mp.Process(
+                target=_rollout_worker,
+                args=(
+                    work_remote,
+                    remote,
+                    self.shared_weights,
+                    self.lock,
+                    worker_id,
+                    threads_per_worker,
+                    embedding_store,
+                    precision,
+                    encoder,
+                    encoder_layers,
+                ),
+                daemon=True,
+            )
+            process.start()
+            work_remote.close()
+            self.processes.append(process)
+
+    def broadcast(self, policy):
+        """Copy the learner's latest head weights into shared memory."""
+        with self.lock, torch.no_grad():
+            for key, value in trainable_state_dict(policy).items():
+                self.shared_weights[key].copy_(value)
+
+    def request(self):
+        """Ask every worker to start collecting its next trajectory."""
+        for remote in self.remotes:
+            remote.send(("collect", self.steps_per_worker))
+        self.pending = True
+
+    def gather(self):
+        """Wait for the requested trajectories.
+
+        Returns:
+            List with one trajectory dictionary per worker
+        """
+        if not self.pending:
+            self.request()
+        trajectories = [remote.recv() for remote in self.remotes]
+        self.pending = False
+        return trajectories
+
+    def close(self):
+        """Stop all workers."""
+        if self.pending:
+            self.gather()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
@@ -0,0 +1,314 @@
+"""
+Exhaustive enumeration of the story tree.
+
+Walks every reachable choice path of the environment depth-first, using
+environment snapshots (ink save/restore) to branch, and computes the
+exact optimal episode return under calculate_reward().
+
+The module includes:
+- solve: Memoized depth-first search over (ink state, step) nodes
+- solve_story_tree: Parallel solver that splits the tree across processes
+- load_story_tree: Saved solution lookup, None when missing or stale
+- reachable_texts: Every observation text the environment can produce
+
+Key features:
+- Identical states are visited once (keyed on a hash of the ink state)
+- Invalid actions are scored too, so the optimum is exact for the env
+- Results (optimum, optimal choices, state counts) saved as JSON
+- Serial by default on machines with few CPUs (see MIN_PARALLEL_CPUS)
+- Solved only on request (minutes for the full story), never on load
+
+Usage:
+    python playground/story_tree.py --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from env import ReinforcedShrineAdventureEnv, STORY_PATH
+
+DEFAULT_OUTPUT = "results/story_tree.json"
+
+# Workers do not share memos, so states reachable from several subtrees are
+# solved once per worker; below this many CPUs that costs more than it saves
+# (e.g. 796 s with workers against 492 s serial on a small machine)
+MIN_PARALLEL_CPUS = 8
+
+
+def node_key(snapshot):
+    """Identify a decision point by its ink state hash and step count."""
+    return snapshot.state_key, snapshot.episode_steps
+
+
+def num_actions(env, snapshot):
+    """Actions worth trying: every choice plus one representative invalid action."""
+    return min(len(snapshot.choices) + 1, env.max_choices)
+
+
+def default_workers():
+    """Worker processes to use by default: every CPU, or 1 on small machines."""
+    cpus = os.cpu_count() or 1
+    return cpus if cpus >= MIN_PARALLEL_CPUS else 1
+
+
+def solve(env, snapshot, memo, terminals):
+    """Return the optimal return-to-go from a snapshot.
+
+    Args:
+        env: Environment used to step (its state is overwritten)
+        snapshot: Non-terminal state captured by env.snapshot()
+        memo: Dictionary of node key -> optimal return-to-go, filled in place
+        terminals: Set of terminal node keys, filled in place
+
+    Returns:
+        Optimal undiscounted return from this state
+    """
+    key = node_key(snapshot)
+    if key in memo:
+        return memo[key]
+
+    best = float("-inf")
+    for action in range(num_actions(env, snapshot)):
+        env.restore(snapshot)
+        _, reward, done, truncated, _ = env.step(action)
+        if done or truncated:
+            if action < len(snapshot.choices):
+                terminals.add(node_key(env.snapshot()))
+            value = reward
+        else:
+            value = reward + solve(env, env.snapshot(), memo, terminals)
+        best = max(best, value)
+
+    memo[key] = best
+    return best
+
+
+def optimal_path(env, snapshot, memo):
+    """Follow the optimal actions from a snapshot using a solved memo.
+
+    Returns:
+        List of (action, choice text) pairs
+    """
+    path = []
+    while True:
+        best = None
+        for action in range(num_actions(env, snapshot)):
+            env.restore(snapshot)
+            _, reward, done, truncated, _ = env.step(action)
+            finished = done or truncated
+            child = env.snapshot()
+            value = reward if finished else reward + memo[node_key(child)]
+            if best is None or value > best[0]:
+                best = (value, action, finished, child)
+
+        assert best is not None, "A decision point always has an action to try"
+        _, action, finished, child = best
+        choices = snapshot.choices
+        path.append((action, choices[action] if action < len(choices) else None))
+        if finished:
+            return path
+        snapshot = child
+
+
+def _make_env(max_steps):
+    """Create an environment for tree search (no transition cache needed)."""
+    env = ReinforcedShrineAdventureEnv(transition_cache_size=0)
+    env.max_steps = max_steps
+    env.reset()
+    return env
+
+
+def _solve_subtrees(snapshots, max_steps):
+    """Solve a group of subtrees in a worker process."""
+    env = _make_env(max_steps)
+    memo, terminals = {}, set()
+    for snapshot in snapshots:
+        solve(env, snapshot, memo, terminals)
+    return memo, terminals
+
+
+def _expand_frontier(env, root, min_nodes):
+    """Expand the tree breadth-first until it has at least min_nodes open nodes."""
+    frontier = [root]
+    while frontier and len(frontier) < min_nodes:
+        children = {}
+        for snapshot in frontier:
+            for action in range(len(snapshot.choices)):
+                env.restore(snapshot)
+                _, _, done, truncated, _ = env.step(action)
+                if not (done or truncated):
+                    child = env.snapshot()
+                    children[node_key(child)] = child
+        if not children:
+            break
+        frontier = list(children.values())
+    return frontier
+
+
+def collect_texts(env, snapshot, visited, texts):
+    """Add the text of every state reachable from a snapshot to texts.
+
+    Args:
+        env: Environment used to step (its state is overwritten)
+        snapshot: Non-terminal state captured by env.snapshot()
+        visited: Set of node keys already expanded, filled in place
+        texts: Set of observation texts, filled in place
+    """
+    visited.add(node_key(snapshot))
+    texts.add(snapshot.text)
+    for action in range(len(snapshot.choices)):
+        env.restore(snapshot)
+        _, _, done, truncated, _ = env.step(action)
+        child = env.snapshot()
+        if done or truncated:
+            texts.add(child.text)
+        elif node_key(child) not in visited:
+            collect_texts(env, child, visited, texts)
+
+
+def _collect_subtrees(snapshots, max_steps):
+    """Collect the texts of a group of subtrees in a worker process."""
+    env = _make_env(max_steps)
+    visited, texts = set(), set()
+    for snapshot in snapshots:
+        collect_texts(env, snapshot, visited, texts)
+    return texts
+
+
+def reachable_texts(max_steps=20, num_workers=None):
+    """Enumerate every observation text reachable within max_steps.
+
+    Args:
+        max_steps: Episode step cap (the env default is 20)
+        num_workers: Worker processes (defaults to default_workers())
+
+    Returns:
+        Sorted list of distinct texts
+    """
+    num_workers = num_workers or default_workers()
+    env = _make_env(max_steps)
+    root = env.snapshot()
+    texts = set()
+
+    if num_workers > 1:
+        frontier = _expand_frontier(env, root, 8 * num_workers)
+        groups = [frontier[i :: 4 * num_workers] for i in range(4 * num_workers)]
+        with ProcessPoolExecutor(num_workers) as pool:
+            for sub_texts in pool.map(_collect_subtrees, groups, repeat(max_steps)):
+                texts.update(sub_texts)
+        # The frontier's ancestors were only expanded, never collected
+        visited = {node_key(snapshot) for snapshot in frontier}
+    else:
+        visited = set()
+
+    collect_texts(env, root, visited, texts)
+    return sorted(texts)
+
+
+def story_hash():
+    """Hash the compiled story so cached solutions can be invalidated."""
+    with open(STORY_PATH, "rb") as file:
+        return hashlib.blake2b(file.read(), digest_size=16).hexdigest()
+
+
+def solve_story_tree(max_steps=20, num_workers=None):
+    """Compute the exact optimal return and reachable-state count.
+
+    Args:
+        max_steps: Episode step cap to solve for (the env default is 20)
+        num_workers: Worker processes (defaults to default_workers())
+
+    Returns:
+        Dictionary describing the solution
+    """
+    num_workers = num_workers or default_workers()
+    start = time.perf_counter()
+    env = _make_env(max_steps)
+    root = env.snapshot()
+    memo, terminals = {}, set()
+
+    if num_workers > 1:
+        # Hand out many small groups of subtrees so the workers stay balanced
+        frontier = _expand_frontier(env, root, 8 * num_workers)
+        groups = [frontier[i :: 4 * num_workers] for i in range(4 * num_workers)]
+        with ProcessPoolExecutor(num_workers) as pool:
+            for sub_memo, sub_terminals in pool.map(
+                _solve_subtrees, groups, repeat(max_steps)
+            ):
+                memo.update(sub_memo)
+                terminals.update(sub_terminals)
+
+    # Solves the top of the tree (or all of it) on top of the workers' results
+    optimal_return = solve(env, root, memo, terminals)
+    path = optimal_path(env, root, memo)
+
+    return {
+        "story_hash": story_hash(),
+        "max_steps": max_steps,
+        "optimal_return": optimal_return,
+        "optimal_actions": [action for action, _ in path],
+        "optimal_choices": [choice for _, choice in path],
+        "decision_states": len(memo),
+        "terminal_states": len(terminals),
+        "reachable_states": len(memo) + len(terminals),
+        "workers": num_workers,
+        "elapsed_seconds": time.perf_counter() - start,
+    }
+
+
+def load_story_tree(path=DEFAULT_OUTPUT, max_steps=20):
+    """Load the saved solution of the current story.
+
+    Solving takes minutes, so it is never done here; a missing or stale
+    solution is reported and the caller goes without it.
+
+    Args:
+        path: JSON file holding the solution
+        max_steps: Episode step cap the solution must match
+
+    Returns:
+        Solution dictionary (see solve_story_tree), or None if there is no
+        solution for this story and max_steps
+    """
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            solution = json.load(file)
+        if (
+            solution.get("story_hash") == story_hash()
+            and solution.get("max_steps") == max_steps
+        ):
+            return solution
+
+    print(
+        f"Warning: no solved story tree for this story and max_steps={max_steps} "
+        f"in {path}; solve it with "
+        f"`python playground/story_tree.py --max-steps {max_steps} --output {path}`."
+    )
+    return None
+
+
+def main():
+    """Solve the story tree and save the result."""
+    parser = argparse.ArgumentParser(description="Exhaustively solve the story.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    parser.add_argument("--max-steps", type=int, default=20, help="Episode step cap")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output JSON file")
+    args = parser.parse_args()
+
+    solution = solve_story_tree(max_steps=args.max_steps, num_workers=args.workers)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(solution, file, indent=2)
+
+    print(f"Optimal return: {solution['optimal_return']:.2f}")
+    print(f"Reachable states: {solution['reachable_states']}")
+    print("Optimal choices:", solution["optimal_choices"])
+    print(f"Solved in {solution['elapsed_seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,16 +10,31 @@ The script includes:
 
 Key features:
 - Interactive matplotlib visualization
-- Automatic checkpointing
+- Automatic checkpointing (periodic, head-only, written in the background)
 - Memory-efficient numpy arrays
 - Progress logging and statistics
 - Entropy reduction for successful paths
+- Optional process-pool rollout collection (--workers N)
+- Regret against the story's exact optimal return (once solved, see story_tree.py)
+- Optional on-disk trajectory recording (--record DIR)
+- Optional precomputed text embeddings (--embedding-store DIR)
+- Configurable device and precision (--device, --precision)
+- Pluggable text encoder (--encoder bert|hashing|tfidf|student)
+- Layer-truncated BERT encoder (--encoder-layers K)
 """
 
+import argparse
 import torch
 import numpy as np
-from env import ReinforcedShrineAdventureEnv
+from env import ReinforcedShrineAdventureEnv, STORY_VARIABLES
 from agent import ShrineAgent
+from rollout import RolloutWorkerPool, load_trajectory
+from recorder import TrajectoryRecorder
+from checkpoint import CheckpointWriter, DEFAULT_CHECKPOINTS
+from embedding_store import EmbeddingStore
+from encoders import ENCODERS
+from execution import PRECISIONS
+from story_tree import load_story_tree
 import matplotlib.pyplot as plt
 from datetime import datetime
 import os
@@ -54,7 +69,97 @@ def moving_average(data, window_size=100):
     return np.convolve(data, np.ones(window_size) / window_size, mode="valid")
 
 
-def main():
+def run_episodes(env, agent, num_episodes, entropy_coef):
+    """Collect episodes in this process, updating the agent as its buffer fills.
+
+    Args:
+        env: Environment to train on
+        agent: Agent to train
+        num_episodes: Number of episodes to run
+        entropy_coef: Callable returning the current entropy coefficient
+
+    Yields:
+        Tuple of (total reward, choices made, final items) per episode
+    """
+    for _ in range(num_episodes):
+        observation, _ = env.reset()
+        total_reward = 0
+        done = False
+        truncated = False
+        episode_choices = []
+
+        while not done and not truncated:
+            action, log_prob, value = agent.act(observation)
+            env.annotate(log_prob, value)
+            next_observation, reward, done, truncated, _ = env.step(action)
+
+            # Record episode details
+            if action < len(observation["choices"]):
+                episode_choices.append(observation["choices"][action])
+
+            agent.memory.add(
+                observation, action, reward, done or truncated, log_prob, value
+            )
+
+            total_reward += reward
+            observation = next_observation
+
+            if len(agent.memory) >= agent.batch_size:
+                # Update with current entropy coefficient
+                agent.update(entropy_coef=entropy_coef())
+
+        yield total_reward, episode_choices, observation["items"]
+
+
+def run_worker_episodes(pool, agent, num_episodes, entropy_coef, recorder=None):
+    """Collect episodes with rollout workers while the agent learns.
+
+    The next batch is requested before each update, so workers always act
+    with weights that are at most one PPO update old.
+
+    Args:
+        pool: RolloutWorkerPool collecting the trajectories
+        agent: Learner agent
+        num_episodes: Number of episodes to run
+        entropy_coef: Callable returning the current entropy coefficient
+        recorder: Optional TrajectoryRecorder for the collected transitions
+
+    Yields:
+        Tuple of (total reward, choices made, final items) per episode
+    """
+    completed = 0
+    pool.broadcast(agent.policy)
+    pool.request()
+
+    while completed < num_episodes:
+        trajectories = pool.gather()
+        pool.request()
+
+        for trajectory in trajectories:
+            load_trajectory(agent, trajectory)
+            if recorder is not None:
+                recorder.add_trajectory(trajectory)
+        agent.update(entropy_coef=entropy_coef())
+        pool.broadcast(agent.policy)
+
+        for trajectory in trajectories:
+            for episode in trajectory["episodes"]:
+                if completed < num_episodes:
+                    completed += 1
+                    yield episode["total_reward"], episode["choices"], episode["items"]
+
+
+def main(
+    num_workers=0,
+    record_dir=None,
+    embedding_store=None,
+    device=None,
+    precision="auto",
+    encoder="bert",
+    encoder_layers=None,
+    checkpoint_every=50,
+    checkpoint_dir=DEFAULT_CHECKPOINTS,
+):
     """Main training loop.
 
     Implements:
@@ -63,6 +168,17 @@ def main():
     3. Live progress visualization
     4. Model checkpointing and results saving
     5. Entropy reduction for successful paths
+
+    Args:
+        num_workers: Rollout worker processes (0 collects in this process)
+        record_dir: Directory to record every transition to (None disables)
+        embedding_store: Directory of a precomputed embedding store (optional)
+        device: Device to train on (defaults to CUDA when available)
+        precision: Execution precision, see execution.PRECISIONS
+        encoder: Text encoder kind, see encoders.ENCODERS
+        encoder_layers: Transformer layers the BERT encoder keeps (None: all)
+        checkpoint_every: Episodes between background checkpoints (0 disables)
+        checkpoint_dir: Directory for the background checkpoints
     """
     torch.manual_seed(42)
     np.random.seed(42)
@@ -70,9 +186,24 @@ def main():
     results_dir = "results"
     os.makedirs(results_dir, exist_ok=True)
 
-    env = ReinforcedShrineAdventureEnv()
+    recorder = TrajectoryRecorder(record_dir) if record_dir else None
+    env = ReinforcedShrineAdventureEnv(recorder=recorder)
     agent = ShrineAgent(
-        state_size=773, action_size=4, batch_size=256
+        state_size=768 + len(STORY_VARIABLES),
+        action_size=4,
+        batch_size=256,
+        device=device,
+        embedding_store=EmbeddingStore(embedding_store) if embedding_store else None,
+        precision=precision,
+        encoder=encoder,
+        encoder_layers=encoder_layers,
+    )
+    print(f"Execution: {agent.execution}")
+    print(f"Encoder: {agent.policy.encoder.name}")
+    checkpoints = (
+        CheckpointWriter(checkpoint_dir, agent.policy.encoder.identity())
+        if checkpoint_every > 0
+        else None
     )
 
     num_episodes = 1000
@@ -104,48 +235,52 @@ def main():
     scores = np.zeros(num_episodes, dtype=np.float16)
     moving_avg = np.array([], dtype=np.float16)
 
+    # Exact optimum of the story; episodes are judged by their regret against it
+    # when the story tree has been solved (pixi run rl_story_tree)
+    story_tree = load_story_tree(max_steps=env.max_steps)
+    if story_tree is not None:
+        optimal_return = story_tree["optimal_return"]
+        print(f"Optimal return: {optimal_return:.2f}")
+    else:
+        optimal_return = None
+        print("Skipping regret; success is judged by a fixed reward threshold.")
+    regrets = np.full(num_episodes, np.nan, dtype=np.float32)
+
     # Track successful episodes
     success_history = []
     best_reward = float("-inf")
-    success_threshold = 20.0
+    success_regret = 5.0  # Within one key dialogue moment of the optimum
+    success_threshold = 20.0  # Without a solved story tree
     current_entropy_coef = initial_entropy_coef
 
     # Train the agent
     print("Starting training...")
-    for episode in range(num_episodes):
-        observation, _ = env.reset()
-        total_reward = 0
-        done = False
-        truncated = False
-        episode_choices = []
-
-        while not done and not truncated:
-            action, log_prob, value = agent.act(observation)
-            next_observation, reward, done, truncated, _ = env.step(action)
-
-            # Record episode details
-            if action < len(observation["choices"]):
-                episode_choices.append(observation["choices"][action])
-
-            agent.memory.add(
-                observation,
-                action,
-                reward,
-                next_observation,
-                done or truncated,
-                log_prob,
-                value,
-            )
-
-            total_reward += reward
-            observation = next_observation
-
-            if len(agent.memory.states) >= agent.batch_size:
-                # Update with current entropy coefficient
-                agent.update(entropy_coef=current_entropy_coef)
+    if num_workers > 0:
+        pool = RolloutWorkerPool(
+            agent.policy,
+            num_workers=num_workers,
+            steps_per_worker=-(-agent.batch_size // num_workers),
+            embedding_store=embedding_store,
+            # Workers run on CPU, where float16 is not an option
+            precision="auto" if precision == "fp16" else precision,
+            encoder=encoder,
+            encoder_layers=encoder_layers,
+        )
+        episodes = run_worker_episodes(
+            pool, agent, num_episodes, lambda: current_entropy_coef, recorder
+        )
+    else:
+        pool = None
+        episodes = run_episodes(env, agent, num_episodes, lambda: current_entropy_coef)
 
+    for episode, (total_reward, episode_choices, final_items) in enumerate(episodes):
         # Track successful episodes
-        was_successful = total_reward > success_threshold
+        if optimal_return is not None:
+            regret = optimal_return - total_reward
+            regrets[episode] = regret
+            was_successful = regret <= success_regret
+        else:
+            was_successful = total_reward > success_threshold
         success_history.append(was_successful)
 
         # Calculate success rate over recent episodes
@@ -166,9 +301,14 @@ def main():
         # If this was the best episode so far, save the successful path
         if total_reward > best_reward:
             best_reward = total_reward
-            print(f"\nNew best episode! Reward: {total_reward:.2f}")
+            regret_note = (
+                f" (regret {regrets[episode]:.2f})"
+                if optimal_return is not None
+                else ""
+            )
+            print(f"\nNew best episode! Reward: {total_reward:.2f}{regret_note}")
             print("Successful choices:", episode_choices)
-            print("Final items:", observation["items"])
+            print("Final items:", final_items)
             print(f"Current entropy coefficient: {current_entropy_coef:.6f}")
 
         scores[episode] = total_reward
@@ -191,9 +331,43 @@ def main():
         fig.canvas.flush_events()
 
         if episode % 10 == 0:
-            print(f"Episode: {episode}, Score: {total_reward}")
+            regret_note = (
+                f", Regret: {regrets[episode]:.2f}"
+                if optimal_return is not None
+                else ""
+            )
+            print(f"Episode: {episode}, Score: {total_reward}{regret_note}")
+            cache_stats = agent.policy.embedding_cache_stats()
+            if cache_stats:
+                print(
+                    f"Embedding cache: {cache_stats['size']} texts, "
+                    f"hit rate {cache_stats['hit_rate']:.1%}"
+                )
+            padding_stats = agent.policy.encoder.padding_stats()
+            if padding_stats and padding_stats["padded_tokens"]:
+                print(
+                    f"Encoder padding waste: {padding_stats['waste']:.1%} "
+                    f"(unbucketed {padding_stats['unbucketed_waste']:.1%})"
+                )
             torch.cuda.empty_cache()
 
+        if checkpoints is not None and (episode + 1) % checkpoint_every == 0:
+            checkpoints.save(
+                agent,
+                episode + 1,
+                entropy_coef=current_entropy_coef,
+                best_reward=best_reward,
+                scores=scores[: episode + 1].copy(),
+                regrets=regrets[: episode + 1].copy(),
+            )
+
+    if pool is not None:
+        pool.close()
+    if recorder is not None:
+        recorder.close()
+    if checkpoints is not None:
+        checkpoints.close()
+
     plt.ioff()  # Turn off interactive mode
 
     # Save results
@@ -206,8 +380,11 @@ def main():
     torch.save(
         {
             "model_state_dict": agent.policy.state_dict(),
+            "encoder": agent.policy.encoder.identity(),
             "optimizer_state_dict": agent.optimizer.state_dict(),
             "scores": scores,
+            "regrets": regrets,
+            "optimal_return": optimal_return,
             "entropy_coef": current_entropy_coef,
         },
         f"{results_dir}/shrine_agent_{timestamp}.pth",
@@ -219,7 +396,13 @@ def main():
     print(
         f"Average score over last {window_size} episodes: {np.mean(scores[-window_size:]):.2f}"
     )
-    print(f"Best score: {np.max(scores):.2f}")
+    if optimal_return is not None:
+        print(
+            f"Average regret over last {window_size} episodes: {np.mean(regrets[-window_size:]):.2f}"
+        )
+        print(f"Best score: {np.max(scores):.2f} (optimal: {optimal_return:.2f})")
+    else:
+        print(f"Best score: {np.max(scores):.2f}")
     print(f"Success rate: {sum(success_history)/len(success_history)*100:.1f}%")
     print(f"Final entropy coefficient: {current_entropy_coef:.6f}")
 
@@ -227,4 +410,68 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train the PPO agent.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Number of rollout worker processes (0 collects in-process)",
+    )
+    parser.add_argument(
+        "--record",
+        default=None,
+        metavar="DIR",
+        help="Record every transition to this directory (see recorder.py)",
+    )
+    parser.add_argument(
+        "--embedding-store",
+        default=None,
+        metavar="DIR",
+        help="Precomputed embeddings to use instead of running BERT",
+    )
+    parser.add_argument("--device", default=None, help="Device (cuda, cpu, ...)")
+    parser.add_argument(
+        "--precision",
+        default="auto",
+        choices=PRECISIONS,
+        help="Execution precision (auto: fp16 on CUDA, fp32 on CPU)",
+    )
+    parser.add_argument(
+        "--encoder",
+        default="bert",
+        choices=ENCODERS,
+        help="Text encoder (hashing and tfidf need no pretrained model)",
+    )
+    parser.add_argument(
+        "--encoder-layers",
+        type=int,
+        default=None,
+        metavar="K",
+        help="Keep only the first K transformer layers of the BERT encoder",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=50,
+        metavar="N",
+        help="Write a head-only checkpoint every N episodes (0 disables)",
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        default=DEFAULT_CHECKPOINTS,
+        metavar="DIR",
+        help="Directory for the periodic checkpoints",
+    )
+    args = parser.parse_args()
+
+    main(
+        num_workers=args.workers,
+        record_dir=args.record,
+        embedding_store=args.embedding_store,
+        device=args.device,
+        precision=args.precision,
+        encoder=args.encoder,
+        encoder_layers=args.encoder_layers,
+        checkpoint_every=args.checkpoint_every,
+        checkpoint_dir=args.checkpoint_dir,
+    )
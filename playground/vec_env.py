@@ -0,0 +1,169 @@
+"""
+Vectorized wrapper around the text adventure environment.
+
+Steps several independent story instances in lockstep so the agent can
+run one forward pass over a whole batch of observations.
+
+The wrapper includes:
+- In-process stepping of every environment
+- Subprocess workers (one environment per process) for using all cores
+- Automatic resets of finished environments
+
+Key features:
+- Batched observations (strings as lists, arrays stacked along axis 0)
+- Batched rewards, dones and truncation flags as numpy arrays
+- Final observation of a finished episode kept in its info dict
+- Shared intern table for environments in "ids" observation mode
+"""
+
+import multiprocessing as mp
+import numpy as np
+from env import ReinforcedShrineAdventureEnv
+from interning import StringInterner
+
+
+def batch_observations(observations):
+    """Combine per-environment observations into one batched observation.
+
+    Args:
+        observations: List of observation dictionaries
+
+    Returns:
+        Dictionary with numpy fields stacked along a new first axis and
+        every other field collected into a list
+    """
+    batch = {}
+    for key, value in observations[0].items():
+        values = [observation[key] for observation in observations]
+        batch[key] = np.stack(values) if isinstance(value, np.ndarray) else values
+    return batch
+
+
+def _step_and_autoreset(env, action):
+    """Step an environment and reset it if the episode finished."""
+    observation, reward, done, truncated, info = env.step(action)
+    if done or truncated:
+        info = dict(info, final_observation=observation)
+        observation, reset_info = env.reset()
+        if "interned" in reset_info:
+            info["interned"] = {**info.get("interned", {}), **reset_info["interned"]}
+    return observation, reward, done, truncated, info
+
+
+def _worker(remote, parent_remote, env_fn):
+    """Serve step/reset commands for a single environment in a subprocess."""
+    parent_remote.close()
+    env = env_fn()
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == "step":
+                remote.send(_step_and_autoreset(env, data))
+            elif command == "reset":
+                remote.send(env.reset(seed=data))
+            elif command == "close":
+                break
+            else:
+                raise ValueError(f"Unknown worker command '{command}'.")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        remote.close()
+
+
+class ShrineVectorEnv:
+    """Steps N independent story instances in lockstep."""
+
+    def __init__(
+        self, num_envs, asynchronous=False, env_fn=ReinforcedShrineAdventureEnv
+    ):
+        self.num_envs = num_envs
+        self.asynchronous = asynchronous
+        self.closed = False
+        # Union of the strings interned by every environment ("ids" mode)
+        self.interner = StringInterner()
+
+        if asynchronous:
+            ctx = mp.get_context()
+            self.remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(num_envs)])
+            self.processes = []
+            for remote, work_remote in zip(self.remotes, work_remotes):
+                process = ctx.Process(
+                    target=_worker, args=(work_remote, remote, env_fn), daemon=True
+                )
+                process.start()
+                work_remote.close()
+                self.processes.append(process)
+        else:
+            self.envs = [env_fn() for _ in range(num_envs)]
+
+    def reset(self, *, seed=None):
+        """Reset every environment.
+
+        Args:
+            seed: Optional base seed; environment i is seeded with seed + i
+
+        Returns:
+            Tuple of (batched observation, list of info dicts)
+        """
+        seeds = [None if seed is None else seed + i for i in range(self.num_envs)]
+
+        if self.asynchronous:
+            for remote, env_seed in zip(self.remotes, seeds):
+                remote.send(("reset", env_seed))
+            results = [remote.recv() for remote in self.remotes]
+        else:
+            results = [env.reset(seed=s) for env, s in zip(self.envs, seeds)]
+
+        observations, infos = zip(*results)
+        self._merge_interned(infos)
+        return batch_observations(observations), list(infos)
+
+    def step(self, actions):
+        """Step every environment with its action, resetting finished ones.
+
+        Args:
+            actions: Sequence of N actions
+
+        Returns:
+            Tuple of (batched observation, rewards, dones, truncateds, infos)
+        """
+        if self.asynchronous:
+            for remote, action in zip(self.remotes, actions):
+                remote.send(("step", int(action)))
+            results = [remote.recv() for remote in self.remotes]
+        else:
+            results = [
+                _step_and_autoreset(env, int(action))
+                for env, action in zip(self.envs, actions)
+            ]
+
+        observations, rewards, dones, truncateds, infos = zip(*results)
+        self._merge_interned(infos)
+        return (
+            batch_observations(observations),
+            np.array(rewards, dtype=np.float32),
+            np.array(dones, dtype=np.bool_),
+            np.array(truncateds, dtype=np.bool_),
+            list(infos),
+        )
+
+    def _merge_interned(self, infos):
+        """Collect the strings newly interned by the environments."""
+        for info in infos:
+            if "interned" in info:
+                self.interner.update(info["interned"])
+
+    def close(self):
+        """Shut down subprocess workers, if any."""
+        if self.closed:
+            return
+        if self.asynchronous:
+            for remote in self.remotes:
+                remote.send(("close", None))
+            for process in self.processes:
+                process.join()
+        self.closed = True
+
+    def __del__(self):
+        self.close()
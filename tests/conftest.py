@@ -0,0 +1,20 @@
+"""
+Shared pytest setup.
+
+The playground scripts import each other as top-level modules and open the
+story by a path relative to the repository root, so tests run with
+playground/ on sys.path and the repository root as working directory.
+"""
+
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "playground"))
+
+
+@pytest.fixture(autouse=True)
+def repository_root(monkeypatch):
+    """Run every test from the repository root."""
+    monkeypatch.chdir(ROOT)
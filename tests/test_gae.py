@@ -0,0 +1,99 @@
+"""
+Tests for the array-based GAE computation (agent.compute_gae).
+
+The reference is the per-step loop ShrineAgent.update() used before GAE
+was vectorized.
+"""
+
+import numpy as np
+import pytest
+from agent import compute_gae
+
+GAMMA = 0.98
+GAE_LAMBDA = 0.97
+
+
+def reference_gae(rewards, values, dones, gamma=GAMMA, gae_lambda=GAE_LAMBDA):
+    """The original backward loop over a single trajectory."""
+    returns, advantages = [], []
+    next_value = 0
+    advantage = 0
+    for reward, value, done in zip(
+        reversed(rewards), reversed(values), reversed(dones)
+    ):
+        if done:
+            next_value = 0
+            advantage = 0
+
+        td_error = reward + gamma * next_value * (1 - done) - value
+        advantage = td_error + gamma * gae_lambda * advantage * (1 - done)
+
+        returns.insert(0, advantage + value)
+        advantages.insert(0, advantage)
+
+        next_value = value
+    return np.array(advantages), np.array(returns)
+
+
+def random_rollout(rng, shape, done_rate=0.1):
+    rewards = rng.normal(size=shape).astype(np.float32)
+    values = rng.normal(size=shape).astype(np.float32)
+    dones = rng.random(shape) < done_rate
+    return rewards, values, dones
+
+
+@pytest.mark.parametrize("length", [1, 2, 17, 256, 1000])
+def test_matches_reference_1d(length):
+    rewards, values, dones = random_rollout(np.random.default_rng(length), length)
+    advantages, returns = compute_gae(rewards, values, dones, GAMMA, GAE_LAMBDA)
+    expected_advantages, expected_returns = reference_gae(rewards, values, dones)
+
+    assert advantages.shape == returns.shape == (length,)
+    assert advantages.dtype == returns.dtype == np.float32
+    np.testing.assert_allclose(advantages, expected_advantages, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(returns, expected_returns, rtol=1e-5, atol=1e-5)
+
+
+def test_matches_reference_per_env():
+    rewards, values, dones = random_rollout(np.random.default_rng(0), (300, 8), 0.05)
+    advantages, returns = compute_gae(rewards, values, dones, GAMMA, GAE_LAMBDA)
+
+    assert advantages.shape == returns.shape == (300, 8)
+    for env in range(8):
+        expected_advantages, expected_returns = reference_gae(
+            rewards[:, env], values[:, env], dones[:, env]
+        )
+        np.testing.assert_allclose(
+            advantages[:, env], expected_advantages, rtol=1e-5, atol=1e-5
+        )
+        np.testing.assert_allclose(
+            returns[:, env], expected_returns, rtol=1e-5, atol=1e-5
+        )
+
+
+def test_done_stops_bootstrapping_and_propagation():
+    rewards = np.array([1.0, 2.0, 3.0, 4.0, 5.0], dtype=np.float32)
+    values = np.array([0.5, 1.5, 2.5, 3.5, 4.5], dtype=np.float32)
+    dones = np.array([False, True, False, False, True])
+    advantages, returns = compute_gae(rewards, values, dones, GAMMA, GAE_LAMBDA)
+    expected_advantages, expected_returns = reference_gae(rewards, values, dones)
+
+    np.testing.assert_allclose(advantages, expected_advantages, rtol=1e-6)
+    np.testing.assert_allclose(returns, expected_returns, rtol=1e-6)
+    # A done step's advantage is its own TD error, whatever follows it
+    assert advantages[1] == pytest.approx(rewards[1] - values[1])
+    assert advantages[4] == pytest.approx(rewards[4] - values[4])
+
+    # Changing the episode after the boundary leaves the one before it alone
+    later = rewards.copy()
+    later[2:] += 10.0
+    changed, _ = compute_gae(later, values, dones, GAMMA, GAE_LAMBDA)
+    np.testing.assert_array_equal(changed[:2], advantages[:2])
+
+
+def test_bootstraps_from_last_values():
+    advantages, returns = compute_gae(
+        [1.0], [0.5], [False], GAMMA, GAE_LAMBDA, last_values=2.0
+    )
+    assert advantages[0] == pytest.approx(1.0 + GAMMA * 2.0 - 0.5)
+    assert returns[0] == pytest.approx(1.0 + GAMMA * 2.0)
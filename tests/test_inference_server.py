@@ -0,0 +1,75 @@
+"""
+Tests for the dynamic-batching inference server (inference_server.py).
+"""
+
+import threading
+import numpy as np
+import pytest
+import torch
+from inference_server import InferenceClient, InferenceServer
+
+
+class EchoAgent:
+    """Acts with the number of choices minus one; fails on a "boom" text."""
+
+    def act_batch(self, observations):
+        if "boom" in observations["text"]:
+            raise RuntimeError("boom")
+        actions = torch.tensor([len(c) - 1 for c in observations["choices"]])
+        return actions, torch.zeros(len(actions)), torch.ones(len(actions))
+
+
+def observation(text="You stand before the shrine.", num_choices=2):
+    return {
+        "text": text,
+        "choices": [f"choice {i}" for i in range(num_choices)],
+        "items": np.zeros(5, dtype=np.float16),
+        "attributes": np.zeros(6, dtype=np.float32),
+    }
+
+
+@pytest.fixture
+def server():
+    server = InferenceServer(
+        EchoAgent(), address=("localhost", 0), max_latency=0.05
+    ).start()
+    yield server
+    server.close()
+
+
+def test_failed_request_gets_the_error_and_the_server_keeps_serving(server):
+    clients = [InferenceClient(server.address) for _ in range(3)]
+    results = {}
+
+    def act(i, text):
+        try:
+            results[i] = clients[i].act(observation(text, num_choices=i + 1))
+        except RuntimeError as error:
+            results[i] = error
+
+    # Sent together, so the failing request shares a batch with the others
+    threads = [
+        threading.Thread(target=act, args=(i, text))
+        for i, text in enumerate(["fine", "boom", "fine"])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert results[0] == (0, 0.0, 1.0)
+    assert isinstance(results[1], RuntimeError) and "boom" in str(results[1])
+    assert results[2] == (2, 0.0, 1.0)
+    assert server.stats()["failed"] == 1
+
+    # The batching thread survived the failure
+    assert clients[1].act(observation(num_choices=4)) == (3, 0.0, 1.0)
+    for client in clients:
+        client.close()
+
+
+def test_burst_of_connections(server):
+    clients = [InferenceClient(server.address) for _ in range(32)]
+    for client in clients:
+        assert client.act(observation())[0] == 1
+        client.close()
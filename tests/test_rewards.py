@@ -0,0 +1,75 @@
+"""
+Tests for rewards.PhraseMatcher.
+
+The Aho-Corasick automaton only runs for large phrase tables, so it is
+forced on here and checked against the substring path.
+"""
+
+import random
+import pytest
+from rewards import REWARD_PHRASES, PhraseMatcher
+
+# Overlapping ("abc"/"bcd"), nested ("he"/"she"/"hers") and repeated phrases
+PHRASES = {
+    "he": 1.0,
+    "she": 2.0,
+    "his": 4.0,
+    "hers": 8.0,
+    "abc": 16.0,
+    "bcd": 32.0,
+    "c": 64.0,
+    "aaa": 128.0,
+}
+
+TEXTS = [
+    "",
+    "ushers",
+    "She said his and hers",
+    "abcd",
+    "abc bcd",
+    "aaaa",
+    "no phrase here",
+]
+
+
+def both_paths(phrases):
+    """Return a matcher using substring checks and one using the automaton."""
+    substring = PhraseMatcher(phrases, automaton_min_phrases=len(phrases) + 1)
+    automaton = PhraseMatcher(phrases, automaton_min_phrases=0)
+    assert not substring.use_automaton and automaton.use_automaton
+    return substring, automaton
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_automaton_matches_substring_search(text):
+    substring, automaton = both_paths(PHRASES)
+    assert automaton.match(text) == substring.match(text)
+    assert automaton.score(text) == substring.score(text)
+
+
+def test_overlapping_and_nested_phrases_are_all_found():
+    _, automaton = both_paths(PHRASES)
+    found = {automaton.phrases[i] for i in automaton.match("ushers abcd")}
+    assert found == {"he", "she", "hers", "abc", "bcd", "c"}
+
+
+def test_phrase_counts_once():
+    _, automaton = both_paths(PHRASES)
+    assert automaton.score("he he he") == PHRASES["he"]
+
+
+def test_automaton_matches_substring_search_on_random_texts():
+    rng = random.Random(0)
+    substring, automaton = both_paths(PHRASES)
+    for _ in range(500):
+        text = "".join(rng.choice("abcdehirs ") for _ in range(rng.randrange(30)))
+        assert automaton.match(text) == substring.match(text), text
+
+
+def test_reward_table_on_both_paths():
+    substring, automaton = both_paths(REWARD_PHRASES)
+    texts = [f"Well... {phrase.upper()}!" for phrase in REWARD_PHRASES]
+    texts.append(" ".join(REWARD_PHRASES))
+    assert (
+        automaton.score_batch(texts).tolist() == substring.score_batch(texts).tolist()
+    )